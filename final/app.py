@@ -1,17 +1,44 @@
 import os
-import json
-import requests
-from flask import Flask, request, abort
+import time
+import threading
+STARTED_AT = time.monotonic()  # 量測 import 到第一個請求的時間，放在較重的 import 之前
+
+# 直接執行 app.py：先把 __main__ 換成沒有檔案路徑的空模組，再以模組 app 載入並啟動。
+# OCR 子行程（forkserver / spawn）會以 __mp_main__ 重新 import __main__ 的檔案；
+# 若 __main__ 是這個檔案，每個子行程都會再建立一次 LINE API、sqlite 連線、執行緒與行程池
+if __name__ == "__main__":
+    import sys
+    import types
+    sys.modules["__main__"] = types.ModuleType("__main__")
+    import app
+    app.app.run(host="0.0.0.0", port=5000)
+    sys.exit(0)
+
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+from flask import Flask, Response, request, abort
 from dotenv import load_dotenv
-from linebot import LineBotApi, WebhookHandler
-from linebot.exceptions import InvalidSignatureError
+from linebot import LineBotApi, WebhookParser
+from linebot.exceptions import InvalidSignatureError, LineBotApiError
 from linebot.models import (
     MessageEvent, TextMessage, TextSendMessage, FlexSendMessage
 )
 from linebot.models import ImageMessage
-from PIL import Image
-import pytesseract
-from io import BytesIO
+from worker_pool import WorkerPool
+import myai168
+from http_client import get_client
+from cache import TTLCache, normalize_text
+from translation_memory import TranslationMemory
+from session_store import Session, create_session_store
+from ocr_pool import OCRPool, OCRPoolFullError, OCRTimeoutError
+from ocr_cache import OCRCache
+from singleflight import SingleFlight
+from circuit_breaker import CircuitBreaker, CircuitOpenError
+from http_client import DeadlineExceeded
+from text_chunks import split_text, pack_messages
+from rate_limit import RateLimiter
+from languages import resolve_lang
+from image_download import ImageTooLargeError, UnsupportedImageError, download_image
+import metrics
 
 load_dotenv()
 
@@ -22,14 +49,203 @@ LINE_CHANNEL_SECRET = os.getenv('LINE_CHANNEL_SECRET')
 LINE_CHANNEL_ACCESS_TOKEN = os.getenv('LINE_CHANNEL_ACCESS_TOKEN')
 MYAI168_DEV_KEY = os.getenv('MYAI168_DEV_KEY')
 
-line_bot_api = LineBotApi(LINE_CHANNEL_ACCESS_TOKEN)
-handler = WebhookHandler(LINE_CHANNEL_SECRET)
+# 壓力測試時可指向本機的 LINE API stub
+line_bot_api = LineBotApi(
+    LINE_CHANNEL_ACCESS_TOKEN,
+    endpoint=os.getenv('LINE_API_ENDPOINT', 'https://api.line.me'),
+    data_endpoint=os.getenv('LINE_API_DATA_ENDPOINT', 'https://api-data.line.me')
+)
+parser = WebhookParser(LINE_CHANNEL_SECRET)
+
+# 背景處理設定：webhook 只驗證簽章後排入佇列，由 worker 執行緒處理
+# 同一次 webhook 內不同使用者的事件可同時處理（上限為 WORKER_THREADS），同一使用者依序處理
+WORKER_THREADS = int(os.getenv('WORKER_THREADS', '4'))
+EVENT_QUEUE_SIZE = int(os.getenv('EVENT_QUEUE_SIZE', '100'))
+# 文字與圖片分成兩條通道：文字優先，圖片最多佔用 IMAGE_CONCURRENCY 個 worker，
+# 文字最多 TEXT_CONCURRENCY 個（預設保留一個 worker 給圖片，避免圖片永遠排不到）
+TEXT_QUEUE_SIZE = int(os.getenv('TEXT_QUEUE_SIZE', str(EVENT_QUEUE_SIZE)))
+TEXT_CONCURRENCY = int(os.getenv('TEXT_CONCURRENCY', str(max(1, WORKER_THREADS - 1))))
+IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', '20'))
+IMAGE_CONCURRENCY = int(os.getenv('IMAGE_CONCURRENCY', str(max(1, WORKER_THREADS // 2))))
+QUEUE_FULL_MESSAGES = {
+    "text": "目前排隊中的訊息較多，請稍候再傳一次。",
+    "image": "目前排隊辨識的圖片較多，請稍候再傳一次。",
+}
+# reply token 有效期限約一分鐘，超過此秒數改用 push_message
+REPLY_TOKEN_TTL = float(os.getenv('REPLY_TOKEN_TTL', '50'))
+# 每個事件從 webhook 送達起算的處理時間預算（秒），上游呼叫超過預算即中斷
+EVENT_DEADLINE = float(os.getenv('EVENT_DEADLINE', '45'))
+BUSY_MESSAGE = "目前服務忙碌中，請稍後再試。"
+
+worker_pool = WorkerPool(
+    size=WORKER_THREADS,
+    lanes=[
+        ("text", TEXT_QUEUE_SIZE, TEXT_CONCURRENCY),
+        ("image", IMAGE_QUEUE_SIZE, IMAGE_CONCURRENCY),
+    ]
+)
+worker_pool.start()
+# 佇列已滿時的提醒不佔用 worker，另外由小型執行緒池送出；待送的提醒超過上限時直接丟棄
+notice_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="notice")
+notice_slots = threading.BoundedSemaphore(int(os.getenv('NOTICE_QUEUE_SIZE', '20')))
+
+# 限流：文字與圖片分開計算，每位使用者與全域各一個 token bucket（rate 為每秒補充量）
+rate_limiter = RateLimiter(
+    {
+        "text": (
+            float(os.getenv('RATE_TEXT_USER_RATE', '0.5')),
+            float(os.getenv('RATE_TEXT_USER_BURST', '5')),
+            float(os.getenv('RATE_TEXT_GLOBAL_RATE', '20')),
+            float(os.getenv('RATE_TEXT_GLOBAL_BURST', '40')),
+        ),
+        "image": (
+            float(os.getenv('RATE_IMAGE_USER_RATE', '0.1')),
+            float(os.getenv('RATE_IMAGE_USER_BURST', '3')),
+            float(os.getenv('RATE_IMAGE_GLOBAL_RATE', '2')),
+            float(os.getenv('RATE_IMAGE_GLOBAL_BURST', '10')),
+        ),
+    },
+    max_users=int(os.getenv('RATE_MAX_USERS', '10000'))
+)
+# 限流 / 佇列已滿時，同一使用者在這段時間內只提醒一次，之後超量的訊息直接丟棄
+throttle_notices = TTLCache(maxsize=10000, ttl=float(os.getenv('RATE_NOTICE_INTERVAL', '30')))
+THROTTLED_MESSAGES = {
+    "user": "您傳送的訊息太頻繁了，請稍候再試。",
+    "global": BUSY_MESSAGE,
+}
+
+# 查詢模式回覆快取（查詢模式不帶 session，答案只取決於問題本身）
+query_cache = TTLCache(
+    maxsize=int(os.getenv('QUERY_CACHE_SIZE', '1000')),
+    ttl=float(os.getenv('QUERY_CACHE_TTL', '3600')),
+    path=os.getenv('QUERY_CACHE_PATH') or None
+)
+
+# myai168 斷路器：連續失敗或過慢時暫停呼叫，直接回覆忙碌訊息
+upstream_breaker = CircuitBreaker(
+    failure_threshold=int(os.getenv('BREAKER_FAILURES', '5')),
+    slow_call_seconds=float(os.getenv('BREAKER_SLOW_CALL', '20')),
+    cooldown=float(os.getenv('BREAKER_COOLDOWN', '30')),
+    half_open_max_calls=int(os.getenv('BREAKER_HALF_OPEN_CALLS', '1'))
+)
+
+# 查詢模式中相同問題同時送出時只呼叫一次 myai168
+query_flight = SingleFlight()
+
+# 長文翻譯：超過 TRANSLATE_CHUNK_CHARS 字就依段落 / 句子切塊並行翻譯
+TRANSLATE_CHUNK_CHARS = int(os.getenv('TRANSLATE_CHUNK_CHARS', '800'))
+translate_executor = ThreadPoolExecutor(
+    max_workers=int(os.getenv('TRANSLATE_FANOUT', '4')), thread_name_prefix="translate"
+)
+
+# 翻譯記憶庫：相同原文與目標語言不再重複呼叫 myai168
+translation_memory = TranslationMemory(
+    path=os.getenv('TRANSLATION_MEMORY_PATH', 'translation_memory.db'),
+    max_bytes=int(os.getenv('TRANSLATION_MEMORY_MAX_BYTES', str(50 * 1024 * 1024)))
+)
+
+# 使用者 session 記憶區：memory（單一行程）或 sqlite（多個 worker 行程共用）
+sessions = create_session_store(
+    backend=os.getenv('SESSION_BACKEND', 'memory'),
+    ttl=float(os.getenv('SESSION_TTL', '3600')),
+    max_sessions=int(os.getenv('SESSION_MAX_COUNT', '10000')),
+    max_bytes=int(os.getenv('SESSION_MAX_BYTES', str(64 * 1024 * 1024))),
+    path=os.getenv('SESSION_DB_PATH', 'sessions.db')
+)
+
+# OCR 行程池：OCR 不在 webhook / worker 執行緒上執行，結果以 push_message 送回
+ocr_pool = OCRPool(
+    size=int(os.getenv('OCR_PROCESSES', '2')),
+    queue_size=int(os.getenv('OCR_QUEUE_SIZE', '20')),
+    timeout=float(os.getenv('OCR_TIMEOUT', '30')),
+    recycle_after=int(os.getenv('OCR_RECYCLE_AFTER', '200')),
+    preload_langs=os.getenv('OCR_PRELOAD_LANGS', 'eng,chi_tra,eng+chi_tra').split(','),
+    health_interval=float(os.getenv('OCR_HEALTH_INTERVAL', '30'))
+)
+# OCR 結果快取：相同圖片（群組轉傳）不再重跑 OCR
+ocr_cache = OCRCache(
+    memory_size=int(os.getenv('OCR_CACHE_MEMORY_SIZE', '500')),
+    path=os.getenv('OCR_CACHE_PATH', 'ocr_cache.db'),
+    max_entries=int(os.getenv('OCR_CACHE_MAX_ENTRIES', '20000')),
+    use_phash=os.getenv('OCR_CACHE_PHASH', '0') == '1'
+)
+# 圖片下載：串流讀取，超過 IMAGE_MAX_BYTES 就中斷；超過 IMAGE_SPOOL_BYTES 的部分寫到暫存檔
+IMAGE_MAX_BYTES = int(os.getenv('IMAGE_MAX_BYTES', str(10 * 1024 * 1024)))
+IMAGE_SPOOL_BYTES = int(os.getenv('IMAGE_SPOOL_BYTES', str(1024 * 1024)))
+IMAGE_SPOOL_DIR = os.getenv('IMAGE_SPOOL_DIR') or None
+# OCR 語言："auto" 先判斷文字系統再選單一語言包
+OCR_LANG = os.getenv('OCR_LANG', 'auto')
+# 每位使用者上次圖片的語言包，作為下一張圖片的提示
+script_hints = TTLCache(maxsize=int(os.getenv('SCRIPT_HINT_SIZE', '10000')), ttl=7 * 24 * 3600)
+pending_ocr = {}  # user_id → 尚未完成的 OCR Future
+pending_ocr_lock = threading.Lock()
+
+# 啟動預熱：OCR_WARMUP=1 時先啟動 OCR 子行程並載入模型，完成前 /readyz 回 503
+# 預設不預熱，第一張圖片才啟動（文字訊息不需要 OCR）
+OCR_WARMUP = os.getenv('OCR_WARMUP', '0') == '1'
+OCR_WARMUP_TIMEOUT = float(os.getenv('OCR_WARMUP_TIMEOUT', '60'))
+ready = threading.Event()
+startup = {"import_seconds": None, "warmup_seconds": None, "warmup_ok": None, "first_request_seconds": None}
+
+# 取得 push 對象（群組 / 聊天室 / 個人）
+def get_target_id(event):
+    source = event.source
+    return getattr(source, "group_id", None) or getattr(source, "room_id", None) or source.user_id
+
+# 限流檢查：超量時回覆提醒（不呼叫 myai168 / OCR）並回傳 False
+def admit(event, kind):
+    user_id = event.source.user_id
+    scope = rate_limiter.allow(kind, user_id)
+    if scope is None:
+        return True
+    metrics.THROTTLED.inc(kind=kind, scope=scope)
+    notify_once(event, THROTTLED_MESSAGES[scope], kind)
+    return False
+
+# 同一使用者在 RATE_NOTICE_INTERVAL 內只取得一次提醒機會
+def claim_notice(event):
+    if not getattr(event, "reply_token", None):
+        return False
+    return throttle_notices.add(getattr(event.source, "user_id", None), True)
+
+def notify_once(event, text, mode):
+    if claim_notice(event):
+        reply(event, TextSendMessage(text=text), mode)
+
+# 在 webhook 執行緒先判斷是否需要提醒，需要時才排入 notice_executor
+def submit_notice(event, text, mode):
+    if not claim_notice(event):
+        return
+    if not notice_slots.acquire(blocking=False):
+        metrics.ERRORS.inc(stage="notice_dropped", mode=mode)
+        return
+    future = notice_executor.submit(reply, event, TextSendMessage(text=text), mode)
+    future.add_done_callback(lambda f: notice_slots.release())
+
+# 回覆訊息：reply token 可能已過期時改用 push_message
+def reply(event, messages, mode="-"):
+    age = time.time() - event.timestamp / 1000
+    if age < REPLY_TOKEN_TTL:
+        try:
+            with metrics.span("line_reply", mode):
+                line_bot_api.reply_message(event.reply_token, messages)
+            return
+        except LineBotApiError as e:
+            metrics.ERRORS.inc(stage="line_reply", mode=mode)
+            print(f"[reply] reply_message 失敗，改用 push：{e}")
+    with metrics.span("line_push", mode):
+        line_bot_api.push_message(get_target_id(event), messages)
 
-# 使用者 session 記憶區
-user_sessions = {}  # user_id → {mode, session_sn, state, last_text}
+def push(event, messages, mode="-"):
+    try:
+        with metrics.span("line_push", mode):
+            line_bot_api.push_message(get_target_id(event), messages)
+    except LineBotApiError as e:
+        metrics.ERRORS.inc(stage="line_push", mode=mode)
+        print(f"[push] push_message 失敗：{e}")
 
 # 圖文選單：模式選擇 Flex Message
-def send_mode_selector(user_id, reply_token):
+def send_mode_selector(event):
     flex_contents = {
         "type": "bubble",
         "size": "mega",
@@ -58,102 +274,158 @@ def send_mode_selector(user_id, reply_token):
         }
     }
     flex_message = FlexSendMessage(alt_text="請選擇模式", contents=flex_contents)
-    line_bot_api.reply_message(reply_token, flex_message)
+    reply(event, flex_message)
+
+# 經由斷路器呼叫 myai168
+def call_upstream(prompt, session_sn, mode, deadline):
+    # 排隊時已用完時間預算（例如在 translate_executor 等太久的分段）不算上游失敗，不經過斷路器
+    if deadline is not None and deadline <= time.time():
+        raise DeadlineExceeded("送出請求前已超過事件處理時間預算")
+    return upstream_breaker.call(
+        lambda: myai168.chat(prompt, session_sn, MYAI168_DEV_KEY, mode=mode, deadline=deadline)
+    )
+
+def translation_prompt(source_text, target_lang):
+    return (
+        f"你是一位語言專家，請將下列每一個詞彙**強制**翻譯成「{target_lang}」，"
+        f"即使是品牌、地名或人名，也請盡可能翻譯出對應的意思或音譯，不得保留原文或跳過。"
+        f"\n\n使用者句子：{source_text}"
+    )
 
-# 主處理函式：翻譯或查詢
-def process_user_input(user_id, user_input):
-    mode = user_sessions[user_id].get("mode", "translate")
-    url = "https://www.myai168.com/cgu/aieasypay/module/ai-168/chat"
+# 翻譯單一區塊：先查翻譯記憶庫，各區塊獨立（session_sn 為 "0"）以便並行
+def translate_chunk(chunk, target_lang, deadline):
+    remembered = translation_memory.get(chunk, target_lang)
+    if remembered is not None:
+        return remembered
+    full_reply, _ = call_upstream(translation_prompt(chunk, target_lang), "0", "translate", deadline)
+    answer = full_reply.strip()
+    if answer:
+        translation_memory.set(chunk, target_lang, answer)
+    return answer
+
+# 長文切塊後並行翻譯，依原順序組回
+def translate_in_chunks(source_text, target_lang, deadline):
+    chunks = split_text(source_text, TRANSLATE_CHUNK_CHARS)
+    futures = [translate_executor.submit(translate_chunk, chunk, target_lang, deadline) for chunk in chunks]
+    try:
+        parts = [future.result() for future in futures]
+    except CircuitOpenError:
+        metrics.ERRORS.inc(stage="breaker_open", mode="translate")
+        return BUSY_MESSAGE
+    except DeadlineExceeded:
+        metrics.ERRORS.inc(stage="deadline", mode="translate")
+        return BUSY_MESSAGE
+    except Exception as e:
+        metrics.ERRORS.inc(stage="upstream", mode="translate")
+        return f"發生錯誤：{str(e)}"
+    finally:
+        for future in futures:
+            future.cancel()
+
+    if not any(parts):
+        return "無法取得回應內容"
+    # 有段落沒有取得翻譯時標出位置，整段結果也不存進翻譯記憶庫，下次重新翻譯
+    failed = [i for i, part in enumerate(parts, start=1) if not part]
+    answer = "\n\n".join(part or f"（第 {i} 段翻譯失敗）" for i, part in enumerate(parts, start=1))
+    if failed:
+        metrics.ERRORS.inc(stage="empty_chunk", mode="translate")
+        return answer + f"\n\n共 {len(parts)} 段中有 {len(failed)} 段未能翻譯，請稍後再傳一次。"
+    translation_memory.set(source_text, target_lang, answer)
+    return answer
+
+# 詢問要翻譯成哪一種語言；記得上次的語言時提示可以回答「同上」
+def lang_question(session, prefix=""):
+    question = f"{prefix}你希望我將這句話翻譯成哪一種語言？"
+    if session.last_lang:
+        question += f"\n（回覆「同上」即翻譯成{session.last_lang}）"
+    return question
+
+# 主處理函式：翻譯或查詢（會直接修改 session，由呼叫端存回）
+# deadline：time.time() 的絕對時間，超過後不再等待上游
+def process_user_input(session, user_input, deadline=None):
+    mode = session.mode
 
     # 查詢模式
     if mode == "query":
         prompt = f"你是一位知識助手，請簡短清楚地回答下列問題：\n{user_input}"
         session_sn = "0"
-        user_sessions[user_id].update({
-            "session_sn": session_sn,
-            "state": "waiting_text",
-            "last_text": ""
-        })
+        session.session_sn = session_sn
+        session.state = "waiting_text"
+        session.last_text = ""
+
+        cache_key = normalize_text(user_input)
+        cached = query_cache.get(cache_key)
+        if cached is not None:
+            return cached
 
     # 翻譯模式（多輪對話）
     else:
-        session = user_sessions[user_id]
-        session_sn = session.get("session_sn", "0")
-        state = session.get("state", "waiting_text")
-        last_text = session.get("last_text", "")
+        session_sn = session.session_sn
+        state = session.state
+        last_text = session.last_text
 
+        # 詢問目標語言的句子固定不變，直接在本地回覆，不呼叫 myai168
         if state == "waiting_text":
-            prompt = (
-                "你是一位語言學專家，請不要翻譯，"
-                "請你只回覆：「你希望我將這句話翻譯成哪一種語言？」"
-                f"\n\n使用者的句子：{user_input}"
-            )
-            session["last_text"] = user_input
-            session["state"] = "waiting_lang"
+            session.last_text = user_input
+            session.state = "waiting_lang"
+            return lang_question(session)
 
         elif state == "waiting_lang":
-            target_lang = user_input.strip()
-
-            # 要求輸入內容需包含「文」或「語」字樣，才判定為語言
-            if "文" not in target_lang and "語" not in target_lang:
+            # 語言名稱與別名查表；「同上」沿用上次的目標語言
+            target_lang = resolve_lang(user_input, session.last_lang)
+            if target_lang is None:
                 return "請輸入有效語言名稱，例如：英文、日文、法語等。請再試一次。"
 
             source_text = last_text
-            prompt = (
-                f"你是一位語言專家，請將下列每一個詞彙**強制**翻譯成「{target_lang}」，"
-                f"即使是品牌、地名或人名，也請盡可能翻譯出對應的意思或音譯，不得保留原文或跳過。"
-                f"\n\n使用者句子：{source_text}"
-            )
-            session["state"] = "waiting_text"
-            session["last_text"] = ""
-            user_sessions[user_id] = session
+            session.last_lang = target_lang
+            session.state = "waiting_text"
+            session.last_text = ""
 
+            remembered = translation_memory.get(source_text, target_lang)
+            if remembered is not None:
+                return remembered
 
+            if len(source_text) > TRANSLATE_CHUNK_CHARS:
+                return translate_in_chunks(source_text, target_lang, deadline)
+
+            prompt = translation_prompt(source_text, target_lang)
 
-    # 呼叫 myai168 API
-    form_data = {
-        "module": (None, "ai-172"),
-        "dev_key": (None, MYAI168_DEV_KEY),
-        "input": (None, prompt),
-        "search_internet": (None, "false"),
-        "search_url": (None, "www.myai168.com"),
-        "session_sn": (None, session_sn)
-    }
 
+
+    # 時間預算在排隊時就已用完 → 不呼叫上游
+    if deadline is not None and deadline <= time.time():
+        metrics.ERRORS.inc(stage="deadline", mode=mode)
+        return BUSY_MESSAGE
+
+    # 呼叫 myai168 API（串流解析）；查詢模式與同時間的相同問題共用一次呼叫
     try:
-        response = requests.post(url, files=form_data)
-        response.raise_for_status()
-
-        # 擷取 session_sn
-        for line in response.text.splitlines():
-            if "session_sn" in line:
-                try:
-                    session_obj = json.loads(line.replace("data:", "").strip())
-                    new_sn = session_obj.get("session_sn")
-                    if new_sn:
-                        user_sessions[user_id]["session_sn"] = str(new_sn)
-                except:
-                    pass
-
-        # 整理回覆
-        full_reply = ""
-        for line in response.text.splitlines():
-            if line.startswith("data:"):
-                content = line[5:].strip()
-                if content == "[DONE]":
-                    break
-                try:
-                    chunk = json.loads(content)
-                    delta = chunk.get("choices", [{}])[0].get("delta", {})
-                    new_content = delta.get("content", "")
-                    if new_content and "思考中" not in new_content:
-                        full_reply += new_content
-                except:
-                    continue
-
-        return full_reply.strip() if full_reply else "無法取得回應內容"
+        if mode == "query":
+            full_reply, new_sn = query_flight.do(
+                cache_key, lambda: call_upstream(prompt, session_sn, mode, deadline)
+            )
+        else:
+            full_reply, new_sn = call_upstream(prompt, session_sn, mode, deadline)
+        if new_sn:
+            session.session_sn = new_sn
+
+        answer = full_reply.strip()
+        if not answer:
+            return "無法取得回應內容"
 
+        if mode == "query":
+            query_cache.set(cache_key, answer)
+        elif state == "waiting_lang":
+            translation_memory.set(source_text, target_lang, answer)
+        return answer
+
+    except CircuitOpenError:
+        metrics.ERRORS.inc(stage="breaker_open", mode=mode)
+        return BUSY_MESSAGE
+    except DeadlineExceeded:
+        metrics.ERRORS.inc(stage="deadline", mode=mode)
+        return BUSY_MESSAGE
     except Exception as e:
+        metrics.ERRORS.inc(stage="upstream", mode=mode)
         return f"發生錯誤：{str(e)}"
 
 # LINE Webhook 接收入口
@@ -163,14 +435,88 @@ def callback():
     body = request.get_data(as_text=True)
 
     try:
-        handler.handle(body, signature)
+        with metrics.span("signature", "webhook"):
+            events = parser.parse(body, signature)
     except InvalidSignatureError:
+        metrics.ERRORS.inc(stage="signature", mode="webhook")
         abort(400)
 
+    for event in events:
+        metrics.EVENTS.inc(type=getattr(event, "type", "unknown"))
+
+    # 通道已滿的事件不排隊，直接回覆請使用者稍後再傳
+    for event in events:
+        lane = event_lane(event)
+        if not worker_pool.submit(dispatch_event, event, time.monotonic(), key=event_key(event), lane=lane):
+            metrics.ERRORS.inc(stage="enqueue", mode=lane)
+            submit_notice(event, QUEUE_FULL_MESSAGES[lane], lane)
+
+    return 'OK'
+
+# liveness：行程還活著就回 200
+@app.route("/healthz", methods=['GET'])
+def healthz():
     return 'OK'
 
+# readiness：預熱完成後才接收流量
+@app.route("/readyz", methods=['GET'])
+def readyz():
+    if not ready.is_set():
+        return 'warming up', 503
+    return 'OK'
+
+# 記錄從開始 import 到收到第一個請求的時間
+@app.before_request
+def record_first_request():
+    if startup["first_request_seconds"] is None:
+        startup["first_request_seconds"] = round(time.monotonic() - STARTED_AT, 3)
+
+# 佇列與 worker 狀態
+@app.route("/stats", methods=['GET'])
+def stats():
+    return {
+        "worker_pool": worker_pool.stats(),
+        "upstream": get_client().stats(),
+        "query_cache": query_cache.stats(),
+        "query_singleflight": query_flight.stats(),
+        "upstream_breaker": upstream_breaker.stats(),
+        "translation_memory": translation_memory.stats(),
+        "sessions": sessions.stats(),
+        "ocr_pool": ocr_pool.stats(),
+        "ocr_cache": ocr_cache.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "startup": startup,
+    }
+
+metrics.register_collector("linebot", stats)
+
+# Prometheus 格式的延遲直方圖與計數
+@app.route("/metrics", methods=['GET'])
+def metrics_endpoint():
+    return Response(metrics.render(), mimetype="text/plain; version=0.0.4")
+
+# 排序用的 key：同一使用者的事件必須依序處理，翻譯狀態才不會錯亂
+def event_key(event):
+    source = getattr(event, "source", None)
+    return getattr(source, "user_id", None) or (get_target_id(event) if source else None)
+
+# 圖片走 image 通道，其餘事件走 text 通道
+def event_lane(event):
+    if isinstance(event, MessageEvent) and isinstance(event.message, ImageMessage):
+        return "image"
+    return "text"
+
+# 依事件類型分派給對應的處理函式
+def dispatch_event(event, enqueued_at):
+    metrics.observe("queue_wait", time.monotonic() - enqueued_at, event_lane(event))
+    if not isinstance(event, MessageEvent):
+        return
+    if isinstance(event.message, TextMessage):
+        handle_message(event)
+    elif isinstance(event.message, ImageMessage):
+        handle_image(event)
+
 # 處理使用者文字訊息
-@handler.add(MessageEvent, message=TextMessage)
 def handle_message(event):
     user_id = event.source.user_id
     user_text = event.message.text.strip()
@@ -179,77 +525,158 @@ def handle_message(event):
     if user_text.startswith("/mode"):
         selected = user_text.replace("/mode", "").strip()
         if selected in ["translate", "query"]:
-            user_sessions[user_id] = {
-                "mode": selected,
-                "session_sn": "0",
-                "state": "waiting_text",
-                "last_text": ""
-            }
-            line_bot_api.reply_message(
-                event.reply_token,
+            previous = sessions.get(user_id)
+            sessions.put(user_id, Session(mode=selected, last_lang=previous.last_lang if previous else ""))
+            reply(
+                event,
                 TextSendMessage(text=f"已切換至「{selected}」模式，請輸入內容開始。")
             )
         else:
-            line_bot_api.reply_message(
-                event.reply_token,
+            reply(
+                event,
                 TextSendMessage(text="模式無效，請重新選擇。")
             )
         return
 
     # 使用者說「切換模式」→ 顯示 Flex 選單
     if user_text in ["切換模式", "我要選單", "選單", "更換模式"]:
-        send_mode_selector(user_id, event.reply_token)
+        send_mode_selector(event)
         return
 
     # 尚未選擇模式 → 顯示選單
-    if user_id not in user_sessions or "mode" not in user_sessions[user_id]:
-        send_mode_selector(user_id, event.reply_token)
+    session = sessions.get(user_id)
+    if session is None:
+        send_mode_selector(event)
         return
 
     # 處理翻譯或查詢
-    response = process_user_input(user_id, user_text)
-    line_bot_api.reply_message(
-        event.reply_token,
-        TextSendMessage(text=response)
+    if not admit(event, "text"):
+        return
+    mode = session.mode
+    deadline = event.timestamp / 1000 + EVENT_DEADLINE
+    with metrics.span("process", mode):
+        response = process_user_input(session, user_text, deadline)
+    sessions.put(user_id, session)
+    # 長回覆依 LINE 單則 5000 字、單次 5 則的限制切開
+    reply(
+        event,
+        [TextSendMessage(text=text) for text in pack_messages(response)],
+        mode
     )
 
-@handler.add(MessageEvent, message=ImageMessage)
 def handle_image(event):
     user_id = event.source.user_id
+    if not admit(event, "image"):
+        return
 
-    # 取得圖片內容
-    message_content = line_bot_api.get_message_content(event.message.id)
-    image_bytes = BytesIO(message_content.content)
+    # 串流取得圖片內容，過大或格式不支援時不必等整張下載完
+    try:
+        with metrics.span("download", "image"):
+            message_content = line_bot_api.get_message_content(event.message.id)
+            image = download_image(message_content, IMAGE_MAX_BYTES, IMAGE_SPOOL_BYTES, spool_dir=IMAGE_SPOOL_DIR)
+    except ImageTooLargeError:
+        metrics.ERRORS.inc(stage="image_too_large", mode="image")
+        reply(event, TextSendMessage(
+            text=f"圖片檔案太大（上限 {IMAGE_MAX_BYTES // (1024 * 1024)} MB），請縮小後再傳一次。"), "image")
+        return
+    except UnsupportedImageError:
+        metrics.ERRORS.inc(stage="image_unsupported", mode="image")
+        reply(event, TextSendMessage(text="不支援的圖片格式，請傳送 JPEG、PNG、GIF 或 WEBP 圖片。"), "image")
+        return
 
-    # 使用 PIL 開啟圖片並進行 OCR
+    # 相同圖片已辨識過 → 直接使用快取結果
+    digest, phash = ocr_cache.keys_for(image.payload, image.digest)
+    cached_text = ocr_cache.get(digest, phash)
+    if cached_text is not None:
+        image.cleanup()
+        finish_ocr(event, cached_text, reply)
+        return
+
+    # 送進 OCR 行程池；同一使用者的新圖片會取消尚未完成的舊工作
     try:
-        image = Image.open(image_bytes)
-        extracted_text = pytesseract.image_to_string(image, lang='eng+chi_tra')  # 同時支援中英文
+        future = ocr_pool.submit(image.payload, OCR_LANG, script_hints.get(user_id))
+    except OCRPoolFullError:
+        image.cleanup()
+        reply(event, TextSendMessage(text="目前圖片辨識人數眾多，請稍後再試。"), "image")
+        return
+    # 暫存檔在 OCR 結束（完成、逾時或取消）後刪除
+    future.add_done_callback(lambda f: image.cleanup())
+
+    with pending_ocr_lock:
+        previous = pending_ocr.get(user_id)
+        pending_ocr[user_id] = future
+    if previous is not None:
+        ocr_pool.cancel(previous)
+
+    reply(event, TextSendMessage(text="圖片文字辨識中，請稍候…"), "image")
+    future.add_done_callback(lambda f: schedule_ocr_delivery(event, f, digest, phash))
+
+# done callback 在 OCR slot 執行緒上執行：交回 worker pool，與同一使用者的其他工作依序處理，
+# 也不讓 push_message、寫入快取佔住 OCR slot
+def schedule_ocr_delivery(event, future, digest, phash):
+    if not worker_pool.submit(deliver_ocr_result, event, future, digest, phash,
+                              key=event_key(event), lane="image"):
+        # 佇列已滿時直接送出，避免辨識結果遺失
+        deliver_ocr_result(event, future, digest, phash)
+
+# OCR 完成後寫入快取，並以 push_message 回傳結果
+def deliver_ocr_result(event, future, digest, phash):
+    user_id = event.source.user_id
+    with pending_ocr_lock:
+        if pending_ocr.get(user_id) is future:
+            del pending_ocr[user_id]
 
-        if not extracted_text.strip():
-            line_bot_api.reply_message(
-                event.reply_token,
-                TextSendMessage(text="圖片中未偵測到文字，請重新拍照再試一次。")
-            )
-            return
+    if future.cancelled():
+        return
+    try:
+        extracted_text = future.result()
+    except CancelledError:
+        return
+    except OCRTimeoutError:
+        metrics.ERRORS.inc(stage="ocr_timeout", mode="image")
+        push(event, TextSendMessage(text="圖片辨識逾時，請換一張較小或較清楚的圖片再試一次。"), "image")
+        return
+    except Exception as e:
+        metrics.ERRORS.inc(stage="ocr", mode="image")
+        push(event, TextSendMessage(text=f"發生錯誤：{str(e)}"), "image")
+        return
 
-        user_sessions[user_id] = {
-            "mode": "translate",
-            "session_sn": "0",
-            "state": "waiting_lang",
-            "last_text": extracted_text
-        }
+    metrics.observe("ocr", getattr(future, "run_time", 0.0), "image")
 
-        line_bot_api.reply_message(
-            event.reply_token,
-            TextSendMessage(text="圖片文字擷取成功，請問您希望翻譯成哪一種語言？")
-        )
+    # 只記住單一語言的結果；混合文字時清除提示，下次重新偵測
+    lang_used = getattr(future, "lang_used", None)
+    if lang_used and "+" not in lang_used:
+        script_hints.set(user_id, lang_used)
+    else:
+        script_hints.delete(user_id)
 
-    except Exception as e:
-        line_bot_api.reply_message(
-            event.reply_token,
-            TextSendMessage(text=f"發生錯誤：{str(e)}")
-        )
+    ocr_cache.set(digest, phash, extracted_text, getattr(future, "run_time", 0.0))
+    finish_ocr(event, extracted_text, push)
 
-if __name__ == "__main__":
-    app.run(host="0.0.0.0", port=5000)
+# OCR 文字取得後進入翻譯流程；send 為 reply 或 push
+def finish_ocr(event, extracted_text, send):
+    if not extracted_text.strip():
+        send(event, TextSendMessage(text="圖片中未偵測到文字，請重新拍照再試一次。"), "image")
+        return
+
+    user_id = event.source.user_id
+    previous = sessions.get(user_id)
+    session = Session(mode="translate", state="waiting_lang", last_text=extracted_text,
+                      last_lang=previous.last_lang if previous else "")
+    sessions.put(user_id, session)
+    send(event, TextSendMessage(text=lang_question(session, "圖片文字擷取成功，")), "image")
+
+def warm_up():
+    started = time.monotonic()
+    startup["warmup_ok"] = ocr_pool.warm_up(OCR_WARMUP_TIMEOUT)
+    startup["warmup_seconds"] = round(time.monotonic() - started, 3)
+    print(f"[startup] OCR 預熱{'完成' if startup['warmup_ok'] else '未完成'}，耗時 {startup['warmup_seconds']}s")
+    # 預熱失敗時 OCR 仍會在第一張圖片時啟動，不擋住文字訊息
+    ready.set()
+
+startup["import_seconds"] = round(time.monotonic() - STARTED_AT, 3)
+print(f"[startup] import 耗時 {startup['import_seconds']}s")
+if OCR_WARMUP:
+    threading.Thread(target=warm_up, name="warm-up", daemon=True).start()
+else:
+    ready.set()
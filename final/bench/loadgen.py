@@ -0,0 +1,204 @@
+# Webhook 壓力測試：以目標 RPS 送出正確簽章的 LINE webhook，統計吞吐量、尾端延遲與錯誤率
+# 用法：
+#   python bench/stub_myai168.py --port 8101 &
+#   python bench/stub_line.py --port 8102 --image sample.jpg &
+#   MYAI168_URL=http://127.0.0.1:8101/chat LINE_API_ENDPOINT=http://127.0.0.1:8102 \
+#   LINE_API_DATA_ENDPOINT=http://127.0.0.1:8102 LINE_CHANNEL_SECRET=bench python app.py &
+#   python bench/loadgen.py --secret bench --rps 20 --duration 30
+# --spawn-stubs 會在本行程內啟動兩個 stub（仍需自行啟動 app）
+import argparse
+import base64
+import hashlib
+import hmac
+import itertools
+import json
+import random
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+
+def percentile(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * q))]
+
+
+def sign(secret, body):
+    digest = hmac.new(secret.encode("utf-8"), body.encode("utf-8"), hashlib.sha256).digest()
+    return base64.b64encode(digest).decode("utf-8")
+
+
+def text_event(user_id, text, reply_token):
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "replyToken": reply_token,
+        "message": {"id": str(random.randint(10**11, 10**12)), "type": "text", "text": text},
+    }
+
+
+def image_event(user_id, reply_token):
+    return {
+        "type": "message",
+        "mode": "active",
+        "timestamp": int(time.time() * 1000),
+        "source": {"type": "user", "userId": user_id},
+        "replyToken": reply_token,
+        "message": {"id": str(random.randint(10**11, 10**12)), "type": "image",
+                    "contentProvider": {"type": "line"}},
+    }
+
+
+class LoadGenerator:
+    def __init__(self, args):
+        self.args = args
+        self.http = requests.Session()
+        self.lock = threading.Lock()
+        self.sent = {}          # replyToken → 送出時間
+        self.statuses = {}      # HTTP 狀態碼 → 次數
+        self.webhook_latencies = []
+        self.users = [f"Ubench{i:05d}" for i in range(args.users)]
+        self.question_ids = itertools.count()
+
+    def post_webhook(self, events):
+        body = json.dumps({"destination": "Ubench", "events": events}, ensure_ascii=False)
+        headers = {"Content-Type": "application/json", "X-Line-Signature": sign(self.args.secret, body)}
+        start = time.time()
+        try:
+            status = self.http.post(self.args.app + "/callback", data=body.encode("utf-8"),
+                                    headers=headers, timeout=10).status_code
+        except requests.RequestException:
+            status = "error"
+        elapsed = time.time() - start
+        with self.lock:
+            self.statuses[status] = self.statuses.get(status, 0) + 1
+            if status == 200:
+                self.webhook_latencies.append(elapsed)
+                for event in events:
+                    self.sent[event["replyToken"]] = start
+        return status
+
+    def next_question(self):
+        i = next(self.question_ids)
+        if self.args.unique:
+            return f"壓力測試問題 {i}"
+        return f"常見問題 {i % self.args.distinct_questions}"
+
+    def make_body(self):
+        events = []
+        for _ in range(self.args.events_per_body):
+            user_id = random.choice(self.users)
+            token = uuid.uuid4().hex
+            if random.random() < self.args.image_ratio:
+                events.append(image_event(user_id, token))
+            else:
+                events.append(text_event(user_id, self.next_question(), token))
+        return events
+
+    def setup(self):
+        self.http.post(self.args.line_stub + "/_bench/reset", json={})
+        for user_id in self.users:
+            self.post_webhook([text_event(user_id, f"/mode {self.args.mode}", uuid.uuid4().hex)])
+        time.sleep(1)
+        self.http.post(self.args.line_stub + "/_bench/reset", json={})
+        with self.lock:
+            self.sent.clear()
+            self.statuses.clear()
+            self.webhook_latencies.clear()
+
+    def run(self):
+        total = int(self.args.rps * self.args.duration)
+        start = time.time()
+        with ThreadPoolExecutor(max_workers=self.args.concurrency) as pool:
+            for i in range(total):
+                delay = start + i / self.args.rps - time.time()
+                if delay > 0:
+                    time.sleep(delay)
+                pool.submit(self.post_webhook, self.make_body())
+        send_elapsed = time.time() - start
+
+        # 等待所有 reply 到達 stub
+        deadline = time.time() + self.args.drain
+        replies = {}
+        while time.time() < deadline:
+            replies = self.http.get(self.args.line_stub + "/_bench/replies").json()
+            if all(token in replies for token in self.sent):
+                break
+            time.sleep(0.5)
+        pushes = self.http.get(self.args.line_stub + "/_bench/pushes").json()
+        self.report(total, send_elapsed, replies, pushes)
+
+    def report(self, total, send_elapsed, replies, pushes):
+        e2e = [replies[token] - sent_at for token, sent_at in self.sent.items() if token in replies]
+        missing = len(self.sent) - len(e2e)
+        bad_status = sum(count for status, count in self.statuses.items() if status != 200)
+        events_total = total * self.args.events_per_body
+        if e2e:
+            first = min(self.sent.values())
+            last = max(replies[token] for token in self.sent if token in replies)
+            throughput = len(e2e) / max(last - first, 1e-9)
+        else:
+            throughput = 0.0
+
+        print(f"webhook bodies: {total}（{self.args.events_per_body} events/body），送出耗時 {send_elapsed:.1f}s，"
+              f"實際 {total / max(send_elapsed, 1e-9):.1f} RPS")
+        print(f"HTTP 狀態：{self.statuses}")
+        print(f"webhook 回應  p50={percentile(self.webhook_latencies, 0.5) * 1000:.1f}ms "
+              f"p95={percentile(self.webhook_latencies, 0.95) * 1000:.1f}ms "
+              f"p99={percentile(self.webhook_latencies, 0.99) * 1000:.1f}ms")
+        print(f"端到端回覆    p50={percentile(e2e, 0.5) * 1000:.1f}ms "
+              f"p95={percentile(e2e, 0.95) * 1000:.1f}ms "
+              f"p99={percentile(e2e, 0.99) * 1000:.1f}ms max={max(e2e or [0]) * 1000:.1f}ms")
+        print(f"吞吐量：{throughput:.1f} replies/s，push 次數：{sum(pushes.values())}")
+        error_events = bad_status * self.args.events_per_body + missing
+        print(f"錯誤率：{error_events / max(events_total, 1):.2%}（非 200：{bad_status}，未收到回覆：{missing}）")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LINE bot webhook 壓力測試")
+    parser.add_argument("--app", default="http://127.0.0.1:5000")
+    parser.add_argument("--line-stub", default="http://127.0.0.1:8102")
+    parser.add_argument("--secret", required=True, help="與 app 相同的 LINE_CHANNEL_SECRET")
+    parser.add_argument("--rps", type=float, default=10)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--mode", choices=["query", "translate"], default="query")
+    parser.add_argument("--events-per-body", type=int, default=1)
+    parser.add_argument("--image-ratio", type=float, default=0.0)
+    parser.add_argument("--distinct-questions", type=int, default=20)
+    parser.add_argument("--unique", action="store_true", help="每個問題都不同（不命中快取）")
+    parser.add_argument("--drain", type=float, default=60, help="送完後等待回覆的秒數")
+    parser.add_argument("--spawn-stubs", action="store_true")
+    parser.add_argument("--stub-latency", type=float, default=0.5)
+    parser.add_argument("--stub-token-rate", type=float, default=50)
+    parser.add_argument("--stub-tokens", type=int, default=60)
+    parser.add_argument("--image", help="--spawn-stubs 時圖片內容 API 回傳的檔案")
+    args = parser.parse_args()
+
+    if args.spawn_stubs:
+        import stub_line
+        import stub_myai168
+
+        config = stub_myai168.StubConfig(args.stub_latency, 0.2, args.stub_tokens, args.stub_token_rate)
+        upstream = stub_myai168.serve(8101, config)
+        image_bytes = open(args.image, "rb").read() if args.image else b""
+        line = stub_line.serve(8102, stub_line.LineStubState(image_bytes))
+        for server in (upstream, line):
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+        print("stubs: myai168 :8101, LINE API :8102")
+
+    generator = LoadGenerator(args)
+    generator.setup()
+    generator.run()
+
+
+if __name__ == "__main__":
+    main()
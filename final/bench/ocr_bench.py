@@ -0,0 +1,100 @@
+# OCR 前處理基準測試
+# 用法：python bench/ocr_bench.py <圖片資料夾> [--lang eng+chi_tra] [--repeat 3] [--engine auto]
+# 若圖片旁有同名 .txt（例如 menu.jpg / menu.txt）則作為正確答案計算準確率
+import argparse
+import difflib
+import os
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from ocr import DEFAULT_OPTIONS, open_image, preprocess
+from ocr_engine import create_engine
+
+IMAGE_EXTS = (".jpg", ".jpeg", ".png", ".webp", ".bmp")
+
+# 要比較的前處理設定
+SETTINGS = {
+    "raw": {**DEFAULT_OPTIONS, "draft": False, "max_pixels": 0, "grayscale": False, "binarize": False},
+    "draft+cap": {**DEFAULT_OPTIONS, "grayscale": False, "binarize": False},
+    "draft+cap+gray": {**DEFAULT_OPTIONS, "binarize": False},
+    "draft+cap+gray+binarize": dict(DEFAULT_OPTIONS),
+    "cap2MP+gray+binarize": {**DEFAULT_OPTIONS, "max_pixels": 2_000_000},
+    "cap1MP+gray+binarize": {**DEFAULT_OPTIONS, "max_pixels": 1_000_000},
+}
+
+
+# 字元層級相似度（空白不計）
+def accuracy(expected, actual):
+    expected = "".join(expected.split())
+    actual = "".join(actual.split())
+    if not expected:
+        return 1.0 if not actual else 0.0
+    return difflib.SequenceMatcher(None, expected, actual, autojunk=False).ratio()
+
+
+def load_samples(folder):
+    samples = []
+    for name in sorted(os.listdir(folder)):
+        base, ext = os.path.splitext(name)
+        if ext.lower() not in IMAGE_EXTS:
+            continue
+        with open(os.path.join(folder, name), "rb") as f:
+            data = f.read()
+        truth_path = os.path.join(folder, base + ".txt")
+        truth = None
+        if os.path.exists(truth_path):
+            with open(truth_path, "r", encoding="utf-8") as f:
+                truth = f.read()
+        samples.append((name, data, truth))
+    return samples
+
+
+def run(samples, options, lang, repeat, engine):
+    latencies = []
+    scores = []
+    for name, data, truth in samples:
+        for i in range(repeat):
+            start = time.perf_counter()
+            image = preprocess(open_image(data, options), options)
+            text = engine.recognize(image, lang)
+            latencies.append(time.perf_counter() - start)
+        if truth is not None:
+            scores.append(accuracy(truth, text))
+    return latencies, scores
+
+
+def main():
+    parser = argparse.ArgumentParser(description="OCR 前處理設定的延遲與準確率比較")
+    parser.add_argument("folder")
+    parser.add_argument("--lang", default="eng+chi_tra")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--only", nargs="*", help="只跑指定的設定名稱")
+    parser.add_argument("--engine", default="auto", help="auto / tesserocr / pytesseract")
+    args = parser.parse_args()
+
+    samples = load_samples(args.folder)
+    if not samples:
+        print("資料夾中沒有圖片")
+        sys.exit(1)
+
+    engine = create_engine(args.engine)
+    engine.warm_up([args.lang])
+    print(f"{len(samples)} 張圖片，每張重複 {args.repeat} 次，lang={args.lang}，engine={engine.name}")
+    print(f"{'setting':<26}{'p50 ms':>10}{'p95 ms':>10}{'mean ms':>10}{'accuracy':>10}")
+    for name, options in SETTINGS.items():
+        if args.only and name not in args.only:
+            continue
+        latencies, scores = run(samples, options, args.lang, args.repeat, engine)
+        latencies.sort()
+        p50 = latencies[len(latencies) // 2] * 1000
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] * 1000
+        mean = statistics.mean(latencies) * 1000
+        acc = f"{statistics.mean(scores):.3f}" if scores else "n/a"
+        print(f"{name:<26}{p50:>10.1f}{p95:>10.1f}{mean:>10.1f}{acc:>10}")
+
+
+if __name__ == "__main__":
+    main()
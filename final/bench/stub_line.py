@@ -0,0 +1,117 @@
+# 本機 LINE Messaging API stub：reply / push / 取得圖片內容
+# 用法：python bench/stub_line.py --port 8102 [--image sample.jpg] [--latency 0.05]
+# app 端設定 LINE_API_ENDPOINT / LINE_API_DATA_ENDPOINT=http://127.0.0.1:8102
+# GET /_bench/replies 回傳各 replyToken 的回覆時間，GET /_bench/pushes 回傳各使用者的 push 次數
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class LineStubState:
+    def __init__(self, image_bytes=b"", latency=0.0):
+        self.image_bytes = image_bytes
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.replies = {}  # replyToken → 收到 reply 的時間
+        self.pushes = {}   # 使用者 → [push 時間]
+
+    def record_reply(self, token):
+        with self.lock:
+            self.replies[token] = time.time()
+
+    def record_push(self, to):
+        with self.lock:
+            self.pushes.setdefault(to, []).append(time.time())
+
+    def reset(self):
+        with self.lock:
+            self.replies.clear()
+            self.pushes.clear()
+
+
+def make_handler(state):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _json(self, status, obj):
+            data = json.dumps(obj).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if state.latency:
+                time.sleep(state.latency)
+
+            if self.path == "/v2/bot/message/reply":
+                state.record_reply(body.get("replyToken"))
+                self._json(200, {})
+            elif self.path == "/v2/bot/message/push":
+                state.record_push(body.get("to"))
+                self._json(200, {})
+            elif self.path == "/_bench/reset":
+                state.reset()
+                self._json(200, {})
+            else:
+                self._json(404, {"message": "Not found"})
+
+        def do_GET(self):
+            if self.path.startswith("/v2/bot/message/") and self.path.endswith("/content"):
+                if state.latency:
+                    time.sleep(state.latency)
+                self.send_response(200)
+                self.send_header("Content-Type", "image/jpeg")
+                self.send_header("Content-Length", str(len(state.image_bytes)))
+                self.end_headers()
+                self.wfile.write(state.image_bytes)
+            elif self.path == "/_bench/replies":
+                with state.lock:
+                    self._json(200, dict(state.replies))
+            elif self.path == "/_bench/pushes":
+                with state.lock:
+                    self._json(200, {to: len(times) for to, times in state.pushes.items()})
+            else:
+                self._json(404, {"message": "Not found"})
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # 用戶端提前關閉連線屬正常情況，不輸出 traceback
+    def handle_error(self, request, client_address):
+        pass
+
+
+def serve(port, state):
+    return QuietServer(("0.0.0.0", port), make_handler(state))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LINE Messaging API stub")
+    parser.add_argument("--port", type=int, default=8102)
+    parser.add_argument("--image", help="圖片內容 API 回傳的檔案")
+    parser.add_argument("--latency", type=float, default=0.0)
+    args = parser.parse_args()
+
+    image_bytes = b""
+    if args.image:
+        with open(args.image, "rb") as f:
+            image_bytes = f.read()
+    server = serve(args.port, LineStubState(image_bytes, args.latency))
+    print(f"LINE API stub listening on :{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,104 @@
+# 本機 myai168 stub：以 SSE 串流回傳假回覆，可設定延遲與 token 速率
+# 用法：python bench/stub_myai168.py --port 8101 --latency 0.8 --tokens 80 --token-rate 40
+# app 端設定 MYAI168_URL=http://127.0.0.1:8101/chat
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+WORDS = ["這是", "一段", "模擬", "的", "回覆", "內容", "，", "用來", "測試", "串流", "解析", "效能", "。"]
+
+
+class StubConfig:
+    def __init__(self, latency=0.5, jitter=0.2, tokens=60, token_rate=50.0, error_rate=0.0):
+        self.latency = latency          # 第一個 token 之前的等待（秒）
+        self.jitter = jitter            # latency 的隨機變動比例
+        self.tokens = tokens            # 每次回覆的 token 數
+        self.token_rate = token_rate    # 每秒送出幾個 token（0 = 不限速）
+        self.error_rate = error_rate    # 回傳 503 的比例
+
+
+def make_handler(config):
+    session_ids = itertools.count(1000)
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            self.rfile.read(length)
+
+            if random.random() < config.error_rate:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            with lock:
+                session_sn = next(session_ids)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream; charset=utf-8")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            delay = config.latency * (1 + random.uniform(-config.jitter, config.jitter))
+            time.sleep(max(0.0, delay))
+            self._send_event({"session_sn": session_sn})
+            self._send_event({"choices": [{"delta": {"content": "思考中..."}}]})
+
+            interval = 1.0 / config.token_rate if config.token_rate else 0
+            for i in range(config.tokens):
+                self._send_event({"choices": [{"delta": {"content": WORDS[i % len(WORDS)]}}]})
+                if interval:
+                    time.sleep(interval)
+            self._send_chunk(b"data: [DONE]\n\n")
+            self._send_chunk(b"")
+
+        def _send_event(self, obj):
+            self._send_chunk(f"data: {json.dumps(obj, ensure_ascii=False)}\n\n".encode("utf-8"))
+
+        def _send_chunk(self, data):
+            self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+            self.wfile.flush()
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    # 用戶端提前關閉連線屬正常情況，不輸出 traceback
+    def handle_error(self, request, client_address):
+        pass
+
+
+def serve(port, config):
+    return QuietServer(("0.0.0.0", port), make_handler(config))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="myai168 SSE stub")
+    parser.add_argument("--port", type=int, default=8101)
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--jitter", type=float, default=0.2)
+    parser.add_argument("--tokens", type=int, default=60)
+    parser.add_argument("--token-rate", type=float, default=50.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.tokens, args.token_rate, args.error_rate)
+    server = serve(args.port, config)
+    print(f"myai168 stub listening on :{args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
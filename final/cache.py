@@ -0,0 +1,116 @@
+import atexit
+import json
+import os
+import re
+import tempfile
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+
+# 正規化文字：全形轉半形、忽略大小寫、合併空白
+def normalize_text(text):
+    text = unicodedata.normalize("NFKC", text).casefold()
+    return re.sub(r"\s+", " ", text).strip()
+
+
+# 有容量上限（LRU）與存活時間（TTL）的快取，可選擇存檔以便重啟後沿用
+class TTLCache:
+    def __init__(self, maxsize=1000, ttl=3600, path=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.path = path
+        self.data = OrderedDict()  # key → (expires_at, value)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if self.path:
+            self.load()
+            atexit.register(self.save)
+
+    def get(self, key):
+        with self.lock:
+            item = self.data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires_at, value = item
+            if expires_at <= time.time():
+                del self.data[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = (time.time() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+
+    # 不存在（或已過期）時才寫入，回傳是否寫入；檢查與寫入在同一個 lock 內完成
+    def add(self, key, value):
+        with self.lock:
+            item = self.data.get(key)
+            if item is not None and item[0] > time.time():
+                return False
+            self.data[key] = (time.time() + self.ttl, value)
+            self.data.move_to_end(key)
+            while len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+                self.evictions += 1
+            return True
+
+    def delete(self, key):
+        with self.lock:
+            self.data.pop(key, None)
+
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                items = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"[cache] 無法載入 {self.path}：{e}")
+            return
+        now = time.time()
+        with self.lock:
+            for key, expires_at, value in items[-self.maxsize:]:
+                if expires_at > now:
+                    self.data[key] = (expires_at, value)
+
+    # 先寫暫存檔再取代，避免寫到一半的檔案；多個 gunicorn worker 同時存檔時各用自己的暫存檔
+    def save(self):
+        with self.lock:
+            items = [[key, expires_at, value] for key, (expires_at, value) in self.data.items()]
+        fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + ".",
+                                        suffix=".tmp", dir=os.path.dirname(self.path) or ".")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(items, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception:
+            os.unlink(tmp_path)
+            raise
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self.data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+            }
@@ -0,0 +1,91 @@
+import threading
+import time
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+STATE_CODES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+# 斷路器：連續失敗或過慢達 failure_threshold 次就斷開，cooldown 秒後進入半開狀態，
+# 放行少量探測呼叫；探測成功則恢復，失敗則再次斷開
+class CircuitBreaker:
+    def __init__(self, failure_threshold=5, slow_call_seconds=20, cooldown=30, half_open_max_calls=1):
+        self.failure_threshold = failure_threshold
+        self.slow_call_seconds = slow_call_seconds
+        self.cooldown = cooldown
+        self.half_open_max_calls = half_open_max_calls
+        self.lock = threading.Lock()
+        self.state = CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+        self.half_open_calls = 0
+        self.rejected = 0
+        self.transitions = {OPEN: 0, HALF_OPEN: 0, CLOSED: 0}
+
+    def _set_state(self, state):
+        if self.state != state:
+            self.state = state
+            self.transitions[state] += 1
+            print(f"[breaker] 狀態改為 {state}")
+
+    def allow(self):
+        with self.lock:
+            if self.state == OPEN:
+                if time.monotonic() - self.opened_at < self.cooldown:
+                    self.rejected += 1
+                    return False
+                self._set_state(HALF_OPEN)
+                self.half_open_calls = 0
+            if self.state == HALF_OPEN:
+                if self.half_open_calls >= self.half_open_max_calls:
+                    self.rejected += 1
+                    return False
+                self.half_open_calls += 1
+            return True
+
+    def record_success(self, duration):
+        if duration >= self.slow_call_seconds:
+            self.record_failure()
+            return
+        with self.lock:
+            self.failures = 0
+            if self.state == HALF_OPEN:
+                self._set_state(CLOSED)
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+                self._set_state(OPEN)
+                self.opened_at = time.monotonic()
+                self.failures = 0
+
+    # 透過斷路器執行 func；斷開時直接拋出 CircuitOpenError
+    def call(self, func):
+        if not self.allow():
+            raise CircuitOpenError("上游服務暫時無法使用")
+        start = time.monotonic()
+        try:
+            result = func()
+        except Exception:
+            self.record_failure()
+            raise
+        self.record_success(time.monotonic() - start)
+        return result
+
+    def stats(self):
+        with self.lock:
+            return {
+                "state": self.state,
+                "state_code": STATE_CODES[self.state],
+                "consecutive_failures": self.failures,
+                "rejected": self.rejected,
+                "opened": self.transitions[OPEN],
+                "half_opened": self.transitions[HALF_OPEN],
+                "closed": self.transitions[CLOSED],
+            }
@@ -0,0 +1,16 @@
+# 正式環境啟動設定：gunicorn -c gunicorn.conf.py app:app
+# 多個 worker 行程時請設定 SESSION_BACKEND=sqlite，session 才會共用
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '5000')}"
+workers = int(os.getenv('GUNICORN_WORKERS', '1'))
+# webhook 只驗證簽章後排入佇列，少量執行緒就足夠
+worker_class = "gthread"
+threads = int(os.getenv('GUNICORN_THREADS', '8'))
+timeout = int(os.getenv('GUNICORN_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+# 每個 worker 在 fork 之後才 import app：背景執行緒與 OCR 子行程不能跨 fork 共用
+preload_app = False
+accesslog = "-" if os.getenv('GUNICORN_ACCESS_LOG', '0') == '1' else None
+errorlog = "-"
@@ -0,0 +1,141 @@
+import os
+import random
+import threading
+import time
+from collections import deque
+
+import requests
+from requests.adapters import HTTPAdapter
+
+# 上游明確表示沒有處理、可以重送的 HTTP 狀態碼
+# chat 的 POST 不是冪等的：5xx 與讀取逾時時上游可能已經在產生回覆，重送會多花一次生成
+RETRY_STATUS = {429, 503}
+
+
+# 事件的時間預算已用完
+class DeadlineExceeded(requests.Timeout):
+    pass
+
+
+# 共用的 HTTP 連線池：keep-alive、分開的連線/讀取逾時、有上限的重試
+class HttpClient:
+    def __init__(self, pool_size=10, connect_timeout=3.0, read_timeout=30.0,
+                 max_retries=2, backoff_base=0.3, backoff_max=3.0):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+        self.lock = threading.Lock()
+        self.latencies = deque(maxlen=1000)
+        self.calls = 0
+        self.errors = 0
+        self.retries = 0
+
+    # 指數退避加上 full jitter
+    def _backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    # deadline 為 time.time() 的絕對時間；逾時與重試都不會超過 deadline
+    def post(self, url, timeout=None, deadline=None, **kwargs):
+        start = time.perf_counter()
+        attempt = 0
+        while True:
+            request_timeout = timeout or (self.connect_timeout, self.read_timeout)
+            if deadline is not None:
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    self._record(start, ok=False)
+                    raise DeadlineExceeded("超過事件處理時間預算")
+                request_timeout = (min(request_timeout[0], remaining), min(request_timeout[1], remaining))
+            try:
+                response = self.session.post(url, timeout=request_timeout, **kwargs)
+                if response.status_code in RETRY_STATUS and attempt < self.max_retries:
+                    response.close()
+                elif kwargs.get("stream"):
+                    return self._record_on_close(response, start)
+                else:
+                    self._record(start, ok=response.ok)
+                    return response
+            # 只重試連線失敗（含連線逾時）；讀取逾時代表請求已送出
+            except requests.ConnectionError:
+                if attempt >= self.max_retries:
+                    self._record(start, ok=False)
+                    raise
+            except requests.Timeout:
+                self._record(start, ok=False)
+                raise
+            delay = self._backoff(attempt)
+            if deadline is not None and time.time() + delay >= deadline:
+                self._record(start, ok=False)
+                raise DeadlineExceeded("超過事件處理時間預算，不再重試")
+            with self.lock:
+                self.retries += 1
+            time.sleep(delay)
+            attempt += 1
+
+    # 串流回應在讀完內文、關閉時才記錄，延遲才是整個呼叫的時間而不是收到 header 的時間
+    def _record_on_close(self, response, start):
+        close = response.close
+        recorded = []
+
+        def close_and_record():
+            close()
+            if not recorded:
+                recorded.append(True)
+                self._record(start, ok=response.ok)
+
+        response.close = close_and_record
+        return response
+
+    def _record(self, start, ok):
+        elapsed = time.perf_counter() - start
+        with self.lock:
+            self.calls += 1
+            if not ok:
+                self.errors += 1
+            self.latencies.append(elapsed)
+
+    def stats(self):
+        with self.lock:
+            samples = sorted(self.latencies)
+            result = {
+                "calls": self.calls,
+                "errors": self.errors,
+                "retries": self.retries,
+            }
+        if samples:
+            result.update({
+                "last_ms": round(self.latencies[-1] * 1000, 2),
+                "avg_ms": round(sum(samples) / len(samples) * 1000, 2),
+                "p50_ms": round(samples[len(samples) // 2] * 1000, 2),
+                "p95_ms": round(samples[min(len(samples) - 1, int(len(samples) * 0.95))] * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            })
+        return result
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+# 第一次使用時才依環境變數建立共用 client（確保 .env 已載入）
+def get_client():
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient(
+                pool_size=int(os.getenv('HTTP_POOL_SIZE', '10')),
+                connect_timeout=float(os.getenv('HTTP_CONNECT_TIMEOUT', '3')),
+                read_timeout=float(os.getenv('HTTP_READ_TIMEOUT', '30')),
+                max_retries=int(os.getenv('HTTP_MAX_RETRIES', '2')),
+                backoff_base=float(os.getenv('HTTP_BACKOFF_BASE', '0.3')),
+                backoff_max=float(os.getenv('HTTP_BACKOFF_MAX', '3')),
+            )
+        return _client
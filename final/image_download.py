@@ -0,0 +1,112 @@
+import hashlib
+import os
+import tempfile
+from io import BytesIO
+
+
+class ImageTooLargeError(Exception):
+    pass
+
+
+class UnsupportedImageError(Exception):
+    pass
+
+
+SNIFF_BYTES = 12
+
+
+# 依檔頭判斷圖片格式；不是支援的格式回傳 None
+def sniff_image(header):
+    if header.startswith(b"\xff\xd8\xff"):
+        return "jpeg"
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "png"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "gif"
+    if header.startswith(b"RIFF") and header[8:12] == b"WEBP":
+        return "webp"
+    return None
+
+
+# 下載完成的圖片：小圖留在記憶體（data），大圖寫在暫存檔（path）
+class DownloadedImage:
+    def __init__(self, digest, size, kind, data=None, path=None):
+        self.digest = digest
+        self.size = size
+        self.kind = kind
+        self.data = data
+        self.path = path
+
+    # 交給 OCR / 快取的內容：bytes 或暫存檔路徑
+    @property
+    def payload(self):
+        return self.data if self.data is not None else self.path
+
+    def cleanup(self):
+        if self.path is not None:
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+            self.path = None
+
+
+def _close(content):
+    response = getattr(content.response, "response", content.response)
+    try:
+        response.close()
+    except Exception:
+        pass
+
+
+# 串流下載 LINE 圖片：邊下載邊計算 sha256、檢查檔頭與大小上限
+# 超過 max_bytes 或格式不支援時立刻中斷連線；超過 spool_bytes 後改寫入暫存檔
+def download_image(content, max_bytes, spool_bytes, chunk_size=64 * 1024, spool_dir=None):
+    length = content.response.headers.get("content-length")
+    if length and length.isdigit() and int(length) > max_bytes:
+        _close(content)
+        raise ImageTooLargeError(f"圖片大小 {int(length)} bytes 超過上限 {max_bytes}")
+
+    hasher = hashlib.sha256()
+    buffer = BytesIO()
+    spool = None
+    header = b""
+    kind = None
+    size = 0
+    try:
+        for chunk in content.iter_content(chunk_size):
+            if not chunk:
+                continue
+            size += len(chunk)
+            if size > max_bytes:
+                raise ImageTooLargeError(f"圖片大小超過上限 {max_bytes} bytes")
+            if kind is None:
+                header += chunk[:SNIFF_BYTES - len(header)]
+                if len(header) >= SNIFF_BYTES:
+                    kind = sniff_image(header)
+                    if kind is None:
+                        raise UnsupportedImageError("不支援的圖片格式")
+            hasher.update(chunk)
+            if spool is None and size > spool_bytes:
+                spool = tempfile.NamedTemporaryFile(prefix="linebot-image-", dir=spool_dir, delete=False)
+                spool.write(buffer.getvalue())
+                buffer = None
+            (spool or buffer).write(chunk)
+
+        # 比 SNIFF_BYTES 還小的檔案
+        if kind is None:
+            kind = sniff_image(header)
+            if kind is None:
+                raise UnsupportedImageError("不支援的圖片格式")
+    except BaseException:
+        if spool is not None:
+            spool.close()
+            os.remove(spool.name)
+        raise
+    finally:
+        _close(content)
+
+    if spool is None:
+        return DownloadedImage(hasher.hexdigest(), size, kind, data=buffer.getvalue())
+    spool.close()
+    return DownloadedImage(hasher.hexdigest(), size, kind, path=spool.name)
@@ -0,0 +1,86 @@
+import re
+
+from cache import normalize_text
+
+# 目標語言名稱表：標準名稱 → 別名（中文名稱、英文名稱、語言代碼）
+# 標準名稱會直接放進翻譯 prompt，也是翻譯記憶庫的 key，「英語」「English」都會對到同一筆
+LANGUAGES = {
+    "繁體中文": ["中文", "繁中", "繁體", "繁体中文", "正體中文", "台灣中文", "國語", "华语", "華語", "漢語", "汉语",
+              "chinese", "traditionalchinese", "zh", "zhtw", "zh_tw", "zh-tw", "zh-hant"],
+    "簡體中文": ["簡中", "簡體", "简体", "简体中文", "简中", "大陸中文", "simplifiedchinese", "chinesesimplified",
+              "zhcn", "zh_cn", "zh-cn", "zh-hans"],
+    "粵語": ["廣東話", "广东话", "粵文", "粤语", "cantonese", "yue"],
+    "台語": ["臺語", "閩南語", "台灣話", "taiwanese", "hokkien"],
+    "英文": ["英語", "英语", "english", "en", "en-us", "en-gb"],
+    "日文": ["日語", "日语", "日本語", "日本语", "日本話", "japanese", "ja", "jp"],
+    "韓文": ["韓語", "韩语", "韩文", "韓國語", "한국어", "korean", "ko", "kr"],
+    "法文": ["法語", "法语", "français", "francais", "french", "fr"],
+    "德文": ["德語", "德语", "deutsch", "german", "de"],
+    "西班牙文": ["西班牙語", "西班牙语", "西文", "español", "espanol", "spanish", "es"],
+    "葡萄牙文": ["葡萄牙語", "葡萄牙语", "葡文", "português", "portugues", "portuguese", "pt"],
+    "義大利文": ["義大利語", "意大利語", "意大利语", "意大利文", "義文", "italiano", "italian"],
+    "俄文": ["俄語", "俄语", "русский", "russian", "ru"],
+    "阿拉伯文": ["阿拉伯語", "阿拉伯语", "العربية", "arabic", "ar"],
+    "泰文": ["泰語", "泰语", "ไทย", "thai", "th"],
+    "越南文": ["越南語", "越南语", "越文", "tiếngviệt", "tiengviet", "vietnamese", "vi"],
+    "印尼文": ["印尼語", "印尼语", "印度尼西亞語", "bahasaindonesia", "indonesian"],
+    "馬來文": ["馬來語", "马来语", "bahasamelayu", "malay"],
+    "菲律賓文": ["菲律賓語", "他加祿語", "tagalog", "filipino", "tl"],
+    "印地文": ["印地語", "印度語", "हिन्दी", "hindi"],
+    "荷蘭文": ["荷蘭語", "荷兰语", "nederlands", "dutch", "nl"],
+    "土耳其文": ["土耳其語", "土耳其语", "türkçe", "turkce", "turkish", "tr"],
+    "波蘭文": ["波蘭語", "波兰语", "polski", "polish", "pl"],
+    "瑞典文": ["瑞典語", "svenska", "swedish", "sv"],
+    "希臘文": ["希臘語", "希腊语", "ελληνικά", "greek"],
+    "希伯來文": ["希伯來語", "עברית", "hebrew"],
+    "烏克蘭文": ["烏克蘭語", "乌克兰语", "українська", "ukrainian"],
+    "緬甸文": ["緬甸語", "myanmar", "burmese"],
+    "拉丁文": ["拉丁語", "latin"],
+}
+
+# 同時是常見英文單字的語言代碼（hi、it、my…）：單獨回覆時多半不是在指定語言，
+# 只接受「to hi」「lang:hi」「翻成 hi」這類明確寫法
+WORD_CODES = {
+    "hi": "印地文", "it": "義大利文", "my": "緬甸文", "he": "希伯來文", "id": "印尼文",
+    "la": "拉丁文", "uk": "烏克蘭文", "ms": "馬來文", "el": "希臘文", "nan": "台語",
+}
+
+# 「同上」等回答沿用使用者上次的目標語言
+REPEAT_WORDS = {"同上", "一樣", "一样", "跟上次一樣", "跟上次一样", "照舊", "上次", "same", "sameasbefore", "again"}
+
+# 「翻成英文」「請幫我翻譯成日文」→ 取出語言名稱
+_PREFIX_RE = re.compile(r"^(?:請|请)?(?:幫我|帮我)?(?:翻譯|翻译|翻|轉|转|換|换)?(?:成|為|为|到)?(?:to|into|lang)?")
+_PUNCT_RE = re.compile(r"[\s。，、！？!?,.；;：:「」『』\"']+")
+# 表中沒有的語言仍接受「…文」「…語」形式的短回答
+_GENERIC_RE = re.compile(r"^\S{1,10}[文語语]$")
+
+
+# 回傳 (去掉前綴的語言名稱, 是否有「翻成」「to」「lang:」等明確前綴)
+def _clean(text):
+    text = _PUNCT_RE.sub("", normalize_text(text))
+    cleaned = _PREFIX_RE.sub("", text, count=1)
+    if not cleaned:
+        return text, False
+    return cleaned, cleaned != text
+
+
+# 預先算好：正規化後的名稱 / 別名 → 標準名稱
+ALIASES = {}
+for _name, _aliases in LANGUAGES.items():
+    for _alias in [_name] + _aliases:
+        ALIASES[_PUNCT_RE.sub("", normalize_text(_alias))] = _name
+
+
+# 把使用者輸入的語言轉成標準名稱；「同上」回傳 last_lang；無法判斷時回傳 None
+def resolve_lang(text, last_lang=""):
+    cleaned, explicit = _clean(text)
+    if cleaned in REPEAT_WORDS:
+        return last_lang or None
+    name = ALIASES.get(cleaned)
+    if name is not None:
+        return name
+    if explicit and cleaned in WORD_CODES:
+        return WORD_CODES[cleaned]
+    if _GENERIC_RE.match(cleaned):
+        return cleaned
+    return None
@@ -0,0 +1,167 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+# 預設的延遲分桶（秒）
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+QUANTILES = (0.5, 0.95, 0.99)
+
+_registry = []
+_collectors = []
+_lock = threading.Lock()
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = []
+    for name, value in pairs:
+        value = str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+        escaped.append(f'{name}="{value}"')
+    return "{" + ",".join(escaped) + "}"
+
+
+class Counter:
+    def __init__(self, name, help_text, labelnames=()):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        with _lock:
+            _registry.append(self)
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} counter"]
+        with self.lock:
+            for key, value in sorted(self.values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {value}")
+        return lines
+
+
+# 直方圖：累積分桶 + 每組 label 保留最近的樣本計算 p50/p95/p99（以 summary 輸出）
+class Histogram:
+    def __init__(self, name, help_text, labelnames=(), buckets=DEFAULT_BUCKETS, window=2048):
+        self.name = name
+        self.help_text = help_text
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self.window = window
+        self.series = {}  # label values → [bucket counts, sum, count, recent samples]
+        self.lock = threading.Lock()
+        with _lock:
+            _registry.append(self)
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            if series is None:
+                series = [[0] * len(self.buckets), 0.0, 0, deque(maxlen=self.window)]
+                self.series[key] = series
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[0][i] += 1
+            series[1] += value
+            series[2] += 1
+            series[3].append(value)
+
+    @contextmanager
+    def time(self, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def quantiles(self, **labels):
+        key = tuple(labels.get(name, "") for name in self.labelnames)
+        with self.lock:
+            series = self.series.get(key)
+            samples = sorted(series[3]) if series else []
+        if not samples:
+            return {}
+        return {q: samples[min(len(samples) - 1, int(len(samples) * q))] for q in QUANTILES}
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help_text}", f"# TYPE {self.name} histogram"]
+        summary = [f"# HELP {self.name}_recent {self.help_text}（最近 {self.window} 筆樣本的分位數）",
+                   f"# TYPE {self.name}_recent summary"]
+        with self.lock:
+            items = [(key, list(s[0]), s[1], s[2], sorted(s[3])) for key, s in sorted(self.series.items())]
+        for key, counts, total, count, samples in items:
+            for bound, bucket_count in zip(self.buckets, counts):
+                labels = _format_labels(self.labelnames, key, ("le", bound))
+                lines.append(f"{self.name}_bucket{labels} {bucket_count}")
+            lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, ('le', '+Inf'))} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.labelnames, key)} {total}")
+            lines.append(f"{self.name}_count{_format_labels(self.labelnames, key)} {count}")
+
+            for q in QUANTILES:
+                value = samples[min(len(samples) - 1, int(len(samples) * q))] if samples else 0
+                summary.append(f"{self.name}_recent{_format_labels(self.labelnames, key, ('quantile', q))} {value}")
+            summary.append(f"{self.name}_recent_sum{_format_labels(self.labelnames, key)} {sum(samples)}")
+            summary.append(f"{self.name}_recent_count{_format_labels(self.labelnames, key)} {len(samples)}")
+        return lines + summary
+
+
+# 註冊回傳 dict 的函式；輸出時把數值欄位轉成 gauge（例如各元件的 stats()）
+def register_collector(prefix, func):
+    with _lock:
+        _collectors.append((prefix, func))
+
+
+def _flatten(prefix, value, out):
+    if isinstance(value, bool):
+        out.append((prefix, int(value)))
+    elif isinstance(value, (int, float)):
+        out.append((prefix, value))
+    elif isinstance(value, dict):
+        for key, child in value.items():
+            _flatten(f"{prefix}_{key}", child, out)
+
+
+def render():
+    with _lock:
+        metrics = list(_registry)
+        collectors = list(_collectors)
+    lines = []
+    for metric in metrics:
+        lines.extend(metric.render())
+    for prefix, func in collectors:
+        try:
+            values = []
+            _flatten(prefix, func(), values)
+        except Exception as e:
+            lines.append(f"# collector {prefix} failed: {e}")
+            continue
+        for name, value in values:
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {value}")
+    return "\n".join(lines) + "\n"
+
+
+# 機器人各階段的延遲與計數
+STAGE_SECONDS = Histogram(
+    "linebot_stage_seconds", "各處理階段耗時（秒）", labelnames=("stage", "mode")
+)
+EVENTS = Counter("linebot_events_total", "收到的 webhook 事件數", labelnames=("type",))
+ERRORS = Counter("linebot_errors_total", "各階段發生的錯誤數", labelnames=("stage", "mode"))
+THROTTLED = Counter("linebot_throttled_total", "被限流拒絕的請求數", labelnames=("kind", "scope"))
+
+
+def span(stage, mode="-"):
+    return STAGE_SECONDS.time(stage=stage, mode=mode)
+
+
+def observe(stage, seconds, mode="-"):
+    STAGE_SECONDS.observe(seconds, stage=stage, mode=mode)
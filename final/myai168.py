@@ -0,0 +1,90 @@
+import json
+import os
+import time
+from http_client import DeadlineExceeded, get_client
+import metrics
+
+MYAI168_URL = "https://www.myai168.com/cgu/aieasypay/module/ai-168/chat"
+
+
+# 逐行解析 SSE：同一次掃描取得 session_sn 與回覆內容，遇到 [DONE] 即停止
+# on_first_content：收到第一段回覆內容時呼叫（用於量測 time-to-first-token）
+def parse_sse_lines(lines, on_first_content=None):
+    parts = []
+    session_sn = None
+    for line in lines:
+        if not line or not line.startswith("data:"):
+            continue
+        content = line[5:].strip()
+        if content == "[DONE]":
+            break
+        try:
+            chunk = json.loads(content)
+        except ValueError:
+            continue
+        if not isinstance(chunk, dict):
+            continue
+
+        new_sn = chunk.get("session_sn")
+        if new_sn:
+            session_sn = str(new_sn)
+
+        # 欄位型別不對（null、字串等）時當成沒有內容，不讓整個回覆失敗
+        choices = chunk.get("choices")
+        choice = choices[0] if isinstance(choices, list) and choices and isinstance(choices[0], dict) else {}
+        delta = choice.get("delta") or {}
+        new_content = delta.get("content") if isinstance(delta, dict) else None
+        if not isinstance(new_content, str):
+            continue
+        if new_content and "思考中" not in new_content:
+            if not parts and on_first_content is not None:
+                on_first_content()
+            parts.append(new_content)
+    return "".join(parts), session_sn
+
+
+# 串流讀取時檢查時間預算，超過就中斷
+def _until(lines, deadline):
+    for line in lines:
+        if time.time() > deadline:
+            raise DeadlineExceeded("讀取回覆時超過事件處理時間預算")
+        yield line
+
+
+# 以串流方式呼叫 myai168，回傳 (回覆文字, 新的 session_sn 或 None)
+# deadline：time.time() 的絕對時間，超過時拋出 DeadlineExceeded
+def chat(prompt, session_sn, dev_key, mode="-", deadline=None):
+    form_data = {
+        "module": (None, "ai-172"),
+        "dev_key": (None, dev_key),
+        "input": (None, prompt),
+        "search_internet": (None, "false"),
+        "search_url": (None, "www.myai168.com"),
+        "session_sn": (None, session_sn)
+    }
+
+    start = time.perf_counter()
+    on_first = lambda: metrics.observe("upstream_ttft", time.perf_counter() - start, mode)
+    with metrics.span("upstream_total", mode):
+        url = os.getenv('MYAI168_URL', MYAI168_URL)  # 壓力測試時指向本機 stub
+        with get_client().post(url, files=form_data, stream=True, deadline=deadline) as response:
+            response.raise_for_status()
+            response.encoding = "utf-8"
+            lines = response.iter_lines(decode_unicode=True)
+            if deadline is not None:
+                lines = _until(lines, deadline)
+            result = parse_sse_lines(lines, on_first)
+            _drain(response)
+            return result
+
+
+# [DONE] 之後只剩結尾的 chunk；讀完才能讓連線回到連線池重複使用
+def _drain(response, limit=64 * 1024):
+    read = 0
+    try:
+        for chunk in response.iter_content(4096):
+            read += len(chunk)
+            if read > limit:
+                break
+    except Exception:
+        pass
@@ -0,0 +1,137 @@
+import os
+from io import BytesIO
+
+from PIL import Image, ImageChops, ImageFilter
+
+
+# 前處理設定預設值，可由環境變數覆寫
+DEFAULT_OPTIONS = {
+    "draft": True,           # JPEG 解碼時直接縮小（DCT scaling）
+    "max_pixels": 4_000_000, # 圖片像素上限，超過就等比例縮小
+    "grayscale": True,       # 轉成灰階
+    "binarize": True,        # 自適應二值化
+    "block_size": 31,        # 二值化時計算局部平均的區塊大小（像素）
+    "offset": 10,            # 比局部平均暗多少以上才視為文字
+}
+
+
+def options_from_env():
+    return {
+        "draft": os.getenv('OCR_DRAFT', '1') == '1',
+        "max_pixels": int(os.getenv('OCR_MAX_PIXELS', str(DEFAULT_OPTIONS["max_pixels"]))),
+        "grayscale": os.getenv('OCR_GRAYSCALE', '1') == '1',
+        "binarize": os.getenv('OCR_BINARIZE', '1') == '1',
+        "block_size": int(os.getenv('OCR_BLOCK_SIZE', str(DEFAULT_OPTIONS["block_size"]))),
+        "offset": int(os.getenv('OCR_BINARIZE_OFFSET', str(DEFAULT_OPTIONS["offset"]))),
+    }
+
+
+# 依 max_pixels 計算縮小後的尺寸
+def _target_size(size, max_pixels):
+    width, height = size
+    if not max_pixels or width * height <= max_pixels:
+        return size
+    scale = (max_pixels / (width * height)) ** 0.5
+    return max(1, int(width * scale)), max(1, int(height * scale))
+
+
+# 自適應二值化：與局部平均（box blur）比較，比周圍暗 offset 以上的像素視為文字
+def adaptive_threshold(gray, block_size=31, offset=10):
+    local_mean = gray.filter(ImageFilter.BoxBlur(block_size // 2))
+    darker = ImageChops.subtract(local_mean, gray)
+    return darker.point(lambda v: 0 if v > offset else 255)
+
+
+# image_bytes 可以是圖片內容，或較大圖片下載時的暫存檔路徑
+def open_image(image_bytes, options=None):
+    options = options or DEFAULT_OPTIONS
+    image = Image.open(BytesIO(image_bytes) if isinstance(image_bytes, bytes) else image_bytes)
+    target = _target_size(image.size, options["max_pixels"])
+
+    # 解碼前先設定 draft，JPEG 會以 1/2、1/4、1/8 的比例直接解碼
+    if options["draft"] and target != image.size:
+        image.draft("L" if options["grayscale"] else "RGB", target)
+    return image
+
+
+def preprocess(image, options=None):
+    options = options or DEFAULT_OPTIONS
+    target = _target_size(image.size, options["max_pixels"])
+    if target != image.size:
+        image = image.resize(target, Image.LANCZOS)
+
+    if options["grayscale"] or options["binarize"]:
+        image = image.convert("L")
+    elif image.mode not in ("RGB", "L"):
+        image = image.convert("RGB")
+
+    if options["binarize"]:
+        image = adaptive_threshold(image, options["block_size"], options["offset"])
+    return image
+
+
+DUAL_LANG = "eng+chi_tra"
+# OSD 偵測到的文字系統 → tesseract 語言包
+SCRIPT_LANGS = {
+    "Latin": "eng",
+    "Han": "chi_tra",
+    "HanT": "chi_tra",
+    "HanS": "chi_tra",
+}
+OSD_SIZE = 1024           # OSD 使用的縮圖邊長
+OSD_MIN_CONF = float(os.getenv('OCR_OSD_MIN_CONF', '1.0'))
+
+
+# 第一階段：在縮圖上跑 OSD 判斷文字系統；無法判斷時回傳 None
+def detect_lang(image, engine):
+    thumbnail = image.copy()
+    thumbnail.thumbnail((OSD_SIZE, OSD_SIZE))
+    try:
+        script, confidence = engine.detect_script(thumbnail)
+    except Exception:
+        return None
+    lang = SCRIPT_LANGS.get(script)
+    if lang is None or confidence < OSD_MIN_CONF:
+        return None
+    return lang
+
+
+def _is_cjk(ch):
+    return "\u3400" <= ch <= "\u9fff" or "\uf900" <= ch <= "\ufaff"
+
+
+# 檢查單一語言的辨識結果是否合理；混合文字時改跑雙語
+def matches_lang(text, lang):
+    chars = [ch for ch in text if ch.isalpha()]
+    if not chars:
+        return False
+    cjk_ratio = sum(1 for ch in chars if _is_cjk(ch)) / len(chars)
+    if lang == "eng":
+        return cjk_ratio == 0
+    return cjk_ratio >= 0.8
+
+
+# 在 OCR worker 行程中執行：開啟圖片、前處理後交給 OCR 引擎辨識文字
+# lang 為 "auto" 時先用 hint（使用者上次的語言）辨識，結果合理就不必跑 OSD；
+# 沒有 hint 或結果不符時才以 OSD 選擇單一語言包，仍不符才跑雙語；回傳 (文字, 實際使用的語言)
+def extract_text(image_bytes, lang='auto', options=None, engine=None, hint=None):
+    if engine is None:
+        from ocr_engine import PytesseractEngine
+        engine = PytesseractEngine()
+    options = options or options_from_env()
+    image = preprocess(open_image(image_bytes, options), options)
+    if lang != "auto":
+        return engine.recognize(image, lang), lang
+
+    if hint and hint != DUAL_LANG:
+        text = engine.recognize(image, hint)
+        if matches_lang(text, hint):
+            return text, hint
+
+    # OSD 偵測到的語言與 hint 相同時已經試過，直接跑雙語
+    lang = detect_lang(image, engine)
+    if lang and lang != hint:
+        text = engine.recognize(image, lang)
+        if matches_lang(text, lang):
+            return text, lang
+    return engine.recognize(image, DUAL_LANG), DUAL_LANG
@@ -0,0 +1,147 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+from io import BytesIO
+
+from cache import TTLCache
+
+
+def content_hash(image_bytes):
+    return hashlib.sha256(image_bytes).hexdigest()
+
+
+# dHash：縮成 9x8 灰階後比較相鄰像素，重新壓縮過的相同圖片通常會得到相同結果
+def perceptual_hash(image_bytes):
+    from PIL import Image
+
+    image = Image.open(BytesIO(image_bytes) if isinstance(image_bytes, bytes) else image_bytes)
+    image.draft("L", (64, 64))
+    pixels = list(image.convert("L").resize((9, 8)).getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            bits = (bits << 1) | (1 if left > right else 0)
+    return f"{bits:016x}"
+
+
+# OCR 結果快取：記憶體 LRU + sqlite 磁碟層，以圖片內容雜湊為 key
+class OCRCache:
+    def __init__(self, memory_size=500, path="ocr_cache.db", max_entries=20000, use_phash=False):
+        self.memory = TTLCache(maxsize=memory_size, ttl=7 * 24 * 3600)
+        self.max_entries = max_entries
+        self.use_phash = use_phash
+        self.lock = threading.Lock()
+        self.hits = {"memory": 0, "disk": 0, "phash": 0}
+        self.misses = 0
+        self.evictions = 0
+        self.time_saved = 0.0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            " digest TEXT PRIMARY KEY,"
+            " phash TEXT,"
+            " text TEXT NOT NULL,"
+            " ocr_seconds REAL NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_phash ON ocr_results(phash)")
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_last_used ON ocr_results(last_used)")
+        self.conn.commit()
+
+    # 計算查詢用的 key：(內容雜湊, 感知雜湊或 None)；下載時已算好雜湊可直接傳入 digest
+    def keys_for(self, image_bytes, digest=None):
+        phash = None
+        if self.use_phash:
+            try:
+                phash = perceptual_hash(image_bytes)
+            except Exception:
+                phash = None
+        return digest or content_hash(image_bytes), phash
+
+    def get(self, digest, phash=None):
+        item = self.memory.get(digest)
+        if item is not None:
+            return self._hit("memory", item)
+
+        with self.lock:
+            now = time.time()
+            row = self.conn.execute(
+                "SELECT text, ocr_seconds FROM ocr_results WHERE digest = ?", (digest,)
+            ).fetchone()
+            tier = "disk"
+            if row is not None:
+                self.conn.execute("UPDATE ocr_results SET last_used = ? WHERE digest = ?", (now, digest))
+            elif phash is not None:
+                match = self.conn.execute(
+                    "SELECT digest, text, ocr_seconds FROM ocr_results WHERE phash = ?"
+                    " ORDER BY last_used DESC LIMIT 1",
+                    (phash,)
+                ).fetchone()
+                if match is not None:
+                    # 更新對到的那一筆，並以新圖片的雜湊另存一筆，下次直接以 digest 命中
+                    matched_digest, text, ocr_seconds = match
+                    self.conn.execute(
+                        "UPDATE ocr_results SET last_used = ? WHERE digest = ?", (now, matched_digest)
+                    )
+                    self._insert(digest, phash, text, ocr_seconds, now)
+                    row = (text, ocr_seconds)
+                    tier = "phash"
+            if row is None:
+                self.misses += 1
+                return None
+            self.conn.commit()
+
+        item = (row[0], row[1])
+        self.memory.set(digest, item)
+        return self._hit(tier, item)
+
+    def _hit(self, tier, item):
+        text, ocr_seconds = item
+        with self.lock:
+            self.hits[tier] += 1
+            self.time_saved += ocr_seconds
+        return text
+
+    def set(self, digest, phash, text, ocr_seconds):
+        self.memory.set(digest, (text, ocr_seconds))
+        with self.lock:
+            self._insert(digest, phash, text, ocr_seconds, time.time())
+            self.conn.commit()
+
+    # 寫入一筆並淘汰超過上限的最舊項目（呼叫端持有 lock 並負責 commit）
+    def _insert(self, digest, phash, text, ocr_seconds, last_used):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ocr_results (digest, phash, text, ocr_seconds, last_used)"
+            " VALUES (?, ?, ?, ?, ?)",
+            (digest, phash, text, ocr_seconds, last_used)
+        )
+        count = self.conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+        if count > self.max_entries:
+            cur = self.conn.execute(
+                "DELETE FROM ocr_results WHERE digest IN"
+                " (SELECT digest FROM ocr_results ORDER BY last_used LIMIT ?)",
+                (count - self.max_entries,)
+            )
+            self.evictions += cur.rowcount
+
+    def stats(self):
+        with self.lock:
+            hits = sum(self.hits.values())
+            lookups = hits + self.misses
+            return {
+                "hits": dict(self.hits),
+                "misses": self.misses,
+                "hit_ratio": round(hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "time_saved_ms": round(self.time_saved * 1000, 2),
+                "memory": self.memory.stats(),
+            }
@@ -0,0 +1,107 @@
+import os
+
+try:
+    import tesserocr
+except ImportError:  # 未安裝時使用 pytesseract
+    tesserocr = None
+
+
+# 原本的做法：每張圖片啟動一次 tesseract 子行程
+class PytesseractEngine:
+    name = "pytesseract"
+
+    def __init__(self):
+        import pytesseract
+        self.pytesseract = pytesseract
+
+    def warm_up(self, langs):
+        pass
+
+    def recognize(self, image, lang):
+        return self.pytesseract.image_to_string(image, lang=lang)
+
+    # 回傳 (文字系統名稱, 信心值)
+    def detect_script(self, image):
+        osd = self.pytesseract.image_to_osd(image, output_type=self.pytesseract.Output.DICT)
+        return osd["script"], float(osd["script_conf"])
+
+    def close(self):
+        pass
+
+
+# 常駐的 libtesseract：每種語言組合只載入一次 traineddata，之後重複使用
+class TesserocrEngine:
+    name = "tesserocr"
+
+    def __init__(self):
+        if tesserocr is None:
+            raise RuntimeError("tesserocr 未安裝")
+        self.apis = {}  # lang → PyTessBaseAPI
+        self.osd_api = None
+
+    def _api(self, lang):
+        api = self.apis.get(lang)
+        if api is None:
+            api = tesserocr.PyTessBaseAPI(lang=lang)
+            self.apis[lang] = api
+        return api
+
+    def warm_up(self, langs):
+        for lang in langs:
+            self._api(lang)
+        try:
+            self._osd()
+        except RuntimeError as e:
+            print(f"[ocr] 無法載入 OSD 模型：{e}")
+
+    def recognize(self, image, lang):
+        api = self._api(lang)
+        try:
+            api.SetImage(image)
+            return api.GetUTF8Text()
+        finally:
+            api.Clear()
+
+    def _osd(self):
+        if self.osd_api is None:
+            self.osd_api = tesserocr.PyTessBaseAPI(lang="osd", psm=tesserocr.PSM.OSD_ONLY)
+        return self.osd_api
+
+    def detect_script(self, image):
+        api = self._osd()
+        try:
+            api.SetImage(image)
+            result = api.DetectOrientationScript()
+        finally:
+            api.Clear()
+        if not result:
+            return None, 0.0
+        return result["script_name"], float(result["script_conf"])
+
+    def close(self):
+        for api in self.apis.values():
+            api.End()
+        self.apis = {}
+        if self.osd_api is not None:
+            self.osd_api.End()
+            self.osd_api = None
+
+
+ENGINES = {
+    "pytesseract": PytesseractEngine,
+    "tesserocr": TesserocrEngine,
+}
+
+
+# 依 OCR_ENGINE 建立引擎；auto 時優先使用 tesserocr，無法使用則退回 pytesseract
+def create_engine(name=None):
+    name = name or os.getenv('OCR_ENGINE', 'auto')
+    if name == "auto":
+        name = "tesserocr" if tesserocr is not None else "pytesseract"
+    try:
+        return ENGINES[name]()
+    except Exception as e:
+        if name == "pytesseract":
+            raise
+        print(f"[ocr] 無法使用 {name}，改用 pytesseract：{e}")
+        return PytesseractEngine()
@@ -0,0 +1,308 @@
+import multiprocessing
+import queue
+import threading
+import time
+from concurrent.futures import Future, CancelledError
+
+
+class OCRTimeoutError(Exception):
+    pass
+
+
+class OCRPoolFullError(Exception):
+    pass
+
+
+# 主行程有多條執行緒，fork 可能複製到被鎖住的鎖；改由 forkserver（沒有時用 spawn）啟動子行程
+# forkserver 預先載入 OCR 用到的模組；每個子行程仍會以 __mp_main__ 重新 import 主程式檔，
+# 主程式必須能安全地被 import（app.py 直接執行時的處理見檔案開頭）
+if "forkserver" in multiprocessing.get_all_start_methods():
+    _MP_CONTEXT = multiprocessing.get_context("forkserver")
+    _MP_CONTEXT.set_forkserver_preload(["ocr_pool", "ocr", "ocr_engine"])
+else:
+    _MP_CONTEXT = multiprocessing.get_context("spawn")
+
+
+# OCR 子行程主迴圈：啟動時建立 OCR 引擎並預先載入語言模型，之後重複使用
+# 訊息格式：("ocr", 圖片內容或暫存檔路徑, lang, hint) → ("ok", text, 實際語言) / ("error", message)
+#           ("ping",) → ("pong", 引擎名稱)
+def _worker_main(conn, preload_langs):
+    from ocr import extract_text
+    from ocr_engine import PytesseractEngine, create_engine
+
+    engine = create_engine()
+    try:
+        engine.warm_up(preload_langs)
+    except Exception as e:
+        print(f"[ocr] {engine.name} 預載模型失敗，改用 pytesseract：{e}")
+        engine = PytesseractEngine()
+    fallback = None
+
+    while True:
+        try:
+            message = conn.recv()
+        except EOFError:
+            break
+        if message is None:
+            break
+        if message[0] == "ping":
+            conn.send(("pong", engine.name))
+            continue
+
+        _, image_bytes, lang, hint = message
+        try:
+            conn.send(("ok", *extract_text(image_bytes, lang, engine=engine, hint=hint)))
+        except Exception as e:
+            if engine.name == "pytesseract":
+                conn.send(("error", str(e)))
+                continue
+            # 常駐引擎失敗時退回 pytesseract
+            try:
+                fallback = fallback or PytesseractEngine()
+                conn.send(("ok", *extract_text(image_bytes, lang, engine=fallback, hint=hint)))
+            except Exception as e:
+                conn.send(("error", str(e)))
+    engine.close()
+
+
+# 一個 slot = 一條管理執行緒 + 一個常駐 OCR 子行程
+# 逾時、取消或健康檢查失敗時結束子行程再重開；處理 recycle_after 張後也會換新行程
+class _Slot:
+    def __init__(self, pool, index):
+        self.pool = pool
+        self.index = index
+        self.process = None
+        self.conn = None
+        self.jobs_done = 0
+        self.engine = None
+        self.current = None  # 正在執行的 Future
+        self.ready = threading.Event()
+
+    def _spawn(self):
+        parent_conn, child_conn = _MP_CONTEXT.Pipe()
+        process = _MP_CONTEXT.Process(
+            target=_worker_main, args=(child_conn, self.pool.preload_langs),
+            name=f"ocr-{self.index}", daemon=True
+        )
+        process.start()
+        child_conn.close()
+        self.process = process
+        self.conn = parent_conn
+        self.jobs_done = 0
+        self.pool._record_event("spawned")
+
+    def _kill(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process.join(1)
+            if self.process.is_alive():
+                self.process.kill()
+                self.process.join()
+        if self.conn is not None:
+            self.conn.close()
+        self.process = None
+        self.conn = None
+        self.engine = None
+
+    # 正常結束子行程（回收用）
+    def _stop(self):
+        try:
+            self.conn.send(None)
+            self.process.join(5)
+        except (OSError, ValueError):
+            pass
+        self._kill()
+
+    # 閒置時 ping 子行程，沒有回應就重開
+    def _health_check(self):
+        if self.process is None:
+            return
+        try:
+            self.conn.send(("ping",))
+            if self.conn.poll(self.pool.ping_timeout):
+                _, self.engine = self.conn.recv()
+                return
+        except (EOFError, OSError):
+            pass
+        print(f"[ocr] ocr-{self.index} 健康檢查失敗，重新啟動")
+        self.pool._record_event("health_failures")
+        self._kill()
+
+    # 預先啟動子行程並等到模型載入完成（子行程載入完才會回應 ping）
+    def _warm_up(self):
+        self._spawn()
+        try:
+            self.conn.send(("ping",))
+            if self.conn.poll(self.pool.warm_up_timeout):
+                _, self.engine = self.conn.recv()
+                return
+        except (EOFError, OSError):
+            pass
+        print(f"[ocr] ocr-{self.index} 預熱失敗，第一張圖片時再啟動")
+        self._kill()
+
+    def run(self):
+        if self.pool.warm_start:
+            self._warm_up()
+        self.ready.set()
+        while True:
+            try:
+                item = self.pool.jobs.get(timeout=self.pool.health_interval)
+            except queue.Empty:
+                self._health_check()
+                continue
+            if item is None:
+                if self.process is not None:
+                    self._stop()
+                return
+            future, image_bytes, lang, hint, enqueued_at = item
+            if not future.set_running_or_notify_cancel():
+                continue
+            self.pool._record_wait(time.monotonic() - enqueued_at)
+
+            if self.process is None or not self.process.is_alive():
+                self._kill()
+                self._spawn()
+
+            self.current = future
+            started = time.monotonic()
+            deadline = started + self.pool.timeout
+            try:
+                self.conn.send(("ocr", image_bytes, lang, hint))
+                result = None
+                while result is None:
+                    if future in self.pool.cancel_requested:
+                        self._kill()
+                        future.set_exception(CancelledError())
+                        self.pool._record_done("cancelled")
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._kill()
+                        future.set_exception(OCRTimeoutError(f"OCR 超過 {self.pool.timeout} 秒"))
+                        self.pool._record_done("timeout")
+                        break
+                    if self.conn.poll(min(remaining, 0.2)):
+                        result = self.conn.recv()
+                if result is not None:
+                    status, payload = result[0], result[1]
+                    future.run_time = time.monotonic() - started
+                    self.pool._record_done(status, future.run_time)
+                    if status == "ok":
+                        future.lang_used = result[2]
+                        future.set_result(payload)
+                    else:
+                        future.set_exception(RuntimeError(payload))
+            except (EOFError, OSError) as e:
+                # 子行程異常結束
+                self._kill()
+                future.set_exception(RuntimeError(f"OCR 行程異常結束：{e}"))
+                self.pool._record_done("error")
+            finally:
+                self.pool.cancel_requested.discard(future)
+                self.current = None
+
+            self.jobs_done += 1
+            if self.process is not None and self.jobs_done >= self.pool.recycle_after:
+                self._stop()
+                self.pool._record_event("recycled")
+
+
+# 固定大小的 OCR 行程池：有界佇列、單一工作逾時、可取消
+class OCRPool:
+    def __init__(self, size=2, queue_size=20, timeout=30, recycle_after=200,
+                 preload_langs=("eng", "chi_tra", "eng+chi_tra"), health_interval=30, ping_timeout=5):
+        self.size = size
+        self.timeout = timeout
+        self.recycle_after = recycle_after
+        self.preload_langs = list(preload_langs)
+        self.health_interval = health_interval
+        self.ping_timeout = ping_timeout
+        self.jobs = queue.Queue(maxsize=queue_size)
+        self.cancel_requested = set()
+        self.lock = threading.Lock()
+        self.slots = []
+        self.started = False
+        self.warm_start = False
+        self.warm_up_timeout = 60
+        self.counts = {"ok": 0, "error": 0, "timeout": 0, "cancelled": 0, "rejected": 0}
+        self.events = {"spawned": 0, "recycled": 0, "health_failures": 0}
+        self.waited = 0
+        self.total_wait = 0.0
+        self.total_run = 0.0
+
+    # 第一次有圖片時才建立子行程；warm=True 時各 slot 先啟動子行程並載入模型
+    def start(self, warm=False):
+        with self.lock:
+            if self.started:
+                return
+            self.started = True
+            self.warm_start = warm
+            for i in range(self.size):
+                slot = _Slot(self, i)
+                threading.Thread(target=slot.run, name=f"ocr-slot-{i}", daemon=True).start()
+                self.slots.append(slot)
+
+    # 啟動時預熱（給 readiness probe 用）：全部子行程都載入完成回傳 True
+    def warm_up(self, timeout=60):
+        self.warm_up_timeout = timeout
+        self.start(warm=True)
+        deadline = time.monotonic() + timeout
+        for slot in self.slots:
+            if not slot.ready.wait(max(0.0, deadline - time.monotonic())):
+                return False
+        return all(slot.engine is not None for slot in self.slots)
+
+    def submit(self, image_bytes, lang='auto', hint=None):
+        self.start()
+        future = Future()
+        try:
+            self.jobs.put_nowait((future, image_bytes, lang, hint, time.monotonic()))
+        except queue.Full:
+            with self.lock:
+                self.counts["rejected"] += 1
+            raise OCRPoolFullError("OCR 佇列已滿")
+        return future
+
+    # 尚未開始的工作直接取消；執行中的工作由 slot 結束子行程
+    def cancel(self, future):
+        if future.cancel():
+            with self.lock:
+                self.counts["cancelled"] += 1
+            return True
+        if not future.done():
+            self.cancel_requested.add(future)
+            return True
+        return False
+
+    def shutdown(self):
+        for _ in self.slots:
+            self.jobs.put(None)
+
+    def _record_wait(self, wait):
+        with self.lock:
+            self.waited += 1
+            self.total_wait += wait
+
+    def _record_done(self, status, run_time=0.0):
+        with self.lock:
+            self.counts[status] += 1
+            self.total_run += run_time
+
+    def _record_event(self, name):
+        with self.lock:
+            self.events[name] += 1
+
+    def stats(self):
+        with self.lock:
+            finished = self.counts["ok"] + self.counts["error"]
+            return {
+                "processes": self.size,
+                "queue_depth": self.jobs.qsize(),
+                "busy": sum(1 for slot in self.slots if slot.current is not None),
+                "avg_run_ms": round(self.total_run / finished * 1000, 2) if finished else 0.0,
+                "avg_wait_ms": round(self.total_wait / self.waited * 1000, 2) if self.waited else 0.0,
+                "engines": [slot.engine for slot in self.slots],
+                **self.counts,
+                **self.events,
+            }
@@ -0,0 +1,102 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# Token bucket：每秒補充 rate 個 token，最多累積 burst 個
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = float(burst)
+        self.updated = time.monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    # 到 now 為止是否已補滿（補滿的 bucket 丟掉再重建，結果相同）
+    def is_full(self, now):
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+# 依工作種類（text / image）分別限制：每位使用者一個 bucket，另有全域 bucket
+# allow() 只做記憶體內計算，被拒絕的請求不會碰到 myai168 或 OCR
+class RateLimiter:
+    def __init__(self, limits, max_users=10000):
+        # limits: kind → (每位使用者 rate, 每位使用者 burst, 全域 rate, 全域 burst)；rate <= 0 表示不限制
+        self.limits = limits
+        self.max_users = max_users
+        self.lock = threading.Lock()
+        self.user_buckets = {kind: OrderedDict() for kind in limits}
+        self.global_buckets = {
+            kind: TokenBucket(global_rate, global_burst)
+            for kind, (_, _, global_rate, global_burst) in limits.items()
+        }
+        self.allowed = {kind: 0 for kind in limits}
+        self.throttled = {kind: {"user": 0, "global": 0} for kind in limits}
+
+    def _user_bucket(self, kind, user_id, now):
+        buckets = self.user_buckets[kind]
+        bucket = buckets.get(user_id)
+        if bucket is None:
+            # 只淘汰已補滿的 bucket；閒置最久的都還沒補滿代表使用者都還在活動，
+            # 不重設任何人的限流，新使用者先當成全域忙碌（回傳 None）
+            if len(buckets) >= self.max_users:
+                oldest = next(iter(buckets.values()))
+                if not oldest.is_full(now):
+                    return None
+                buckets.popitem(last=False)
+            rate, burst, _, _ = self.limits[kind]
+            bucket = TokenBucket(rate, burst)
+            buckets[user_id] = bucket
+        else:
+            buckets.move_to_end(user_id)
+        bucket.refill(now)
+        return bucket
+
+    # 允許時回傳 None；拒絕時回傳 "user" 或 "global"（使用者 bucket 數量已達上限時也算 global）
+    def allow(self, kind, user_id):
+        now = time.monotonic()
+        user_rate, _, global_rate, _ = self.limits[kind]
+        with self.lock:
+            user_bucket = self._user_bucket(kind, user_id, now) if user_rate > 0 else None
+            if user_rate > 0 and user_bucket is None:
+                self.throttled[kind]["global"] += 1
+                return "global"
+            global_bucket = self.global_buckets[kind] if global_rate > 0 else None
+            if global_bucket is not None:
+                global_bucket.refill(now)
+
+            # 先檢查兩個 bucket 都有 token 才扣，避免被拒絕的請求白白消耗額度
+            if user_bucket is not None and user_bucket.tokens < 1:
+                self.throttled[kind]["user"] += 1
+                return "user"
+            if global_bucket is not None and global_bucket.tokens < 1:
+                self.throttled[kind]["global"] += 1
+                return "global"
+            if user_bucket is not None:
+                user_bucket.tokens -= 1
+            if global_bucket is not None:
+                global_bucket.tokens -= 1
+            self.allowed[kind] += 1
+            return None
+
+    def stats(self):
+        with self.lock:
+            result = {}
+            for kind, (user_rate, user_burst, global_rate, global_burst) in self.limits.items():
+                global_bucket = self.global_buckets[kind]
+                global_bucket.refill(time.monotonic())
+                result[kind] = {
+                    "user_rate": user_rate,
+                    "user_burst": user_burst,
+                    "global_rate": global_rate,
+                    "global_burst": global_burst,
+                    "global_tokens": round(global_bucket.tokens, 2),
+                    "tracked_users": len(self.user_buckets[kind]),
+                    "allowed": self.allowed[kind],
+                    "throttled_user": self.throttled[kind]["user"],
+                    "throttled_global": self.throttled[kind]["global"],
+                }
+            return result
@@ -0,0 +1,199 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+# 單一使用者的對話狀態；使用 __slots__ 避免每個 session 一個 dict
+class Session:
+    __slots__ = ("mode", "session_sn", "state", "last_text", "last_seen", "last_lang")
+
+    def __init__(self, mode="translate", session_sn="0", state="waiting_text", last_text="", last_seen=0.0, last_lang=""):
+        self.mode = mode
+        self.session_sn = session_sn
+        self.state = state
+        self.last_text = last_text
+        self.last_seen = last_seen
+        self.last_lang = last_lang  # 上次翻譯的目標語言，切換模式或傳圖片時保留
+
+    # 粗估佔用的記憶體大小（物件本身 + 文字內容）
+    def approx_size(self):
+        return 128 + len(self.last_text.encode('utf-8')) + len(self.last_lang.encode('utf-8'))
+
+    def copy(self):
+        return Session(self.mode, self.session_sn, self.state, self.last_text, self.last_seen, self.last_lang)
+
+
+# 單一行程內使用：閒置逾時淘汰 + 數量與記憶體上限（LRU）
+class MemorySessionStore:
+    def __init__(self, ttl=3600, max_sessions=10000, max_bytes=64 * 1024 * 1024):
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.data = OrderedDict()  # user_id → Session
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.expired = 0
+        self.evicted = 0
+
+    def get(self, user_id):
+        with self.lock:
+            session = self.data.get(user_id)
+            if session is None:
+                return None
+            if session.last_seen + self.ttl <= time.time():
+                self._remove(user_id)
+                self.expired += 1
+                return None
+            self.data.move_to_end(user_id)
+            # 回傳複本，呼叫端修改後需 put 回來（與共享後端行為一致）
+            return session.copy()
+
+    def put(self, user_id, session):
+        session = session.copy()
+        session.last_seen = time.time()
+        with self.lock:
+            if user_id in self.data:
+                self._remove(user_id)
+            self.data[user_id] = session
+            self.total_bytes += session.approx_size()
+            while self.data and (len(self.data) > self.max_sessions or self.total_bytes > self.max_bytes):
+                oldest = next(iter(self.data))
+                self._remove(oldest)
+                self.evicted += 1
+
+    def delete(self, user_id):
+        with self.lock:
+            if user_id in self.data:
+                self._remove(user_id)
+
+    def _remove(self, user_id):
+        session = self.data.pop(user_id)
+        self.total_bytes -= session.approx_size()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "backend": "memory",
+                "sessions": len(self.data),
+                "bytes": self.total_bytes,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+# 多個 worker 行程共用：sqlite WAL 模式，每個執行緒各自一條連線
+class SqliteSessionStore:
+    def __init__(self, path="sessions.db", ttl=3600, max_sessions=100000, cleanup_every=200):
+        self.path = path
+        self.ttl = ttl
+        self.max_sessions = max_sessions
+        self.cleanup_every = cleanup_every
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.writes = 0
+        self.expired = 0
+        self.evicted = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS sessions ("
+            " user_id TEXT PRIMARY KEY,"
+            " mode TEXT NOT NULL,"
+            " session_sn TEXT NOT NULL,"
+            " state TEXT NOT NULL,"
+            " last_text TEXT NOT NULL,"
+            " last_seen REAL NOT NULL,"
+            " last_lang TEXT NOT NULL DEFAULT '')"
+        )
+        # 舊版資料庫沒有 last_lang 欄位
+        columns = [row[1] for row in conn.execute("PRAGMA table_info(sessions)")]
+        if "last_lang" not in columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN last_lang TEXT NOT NULL DEFAULT ''")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_sessions_last_seen ON sessions(last_seen)")
+        conn.commit()
+
+    def _conn(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self.local.conn = conn
+        return conn
+
+    def get(self, user_id):
+        row = self._conn().execute(
+            "SELECT mode, session_sn, state, last_text, last_seen, last_lang FROM sessions WHERE user_id = ?",
+            (user_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        session = Session(*row)
+        if session.last_seen + self.ttl <= time.time():
+            self.delete(user_id)
+            with self.lock:
+                self.expired += 1
+            return None
+        return session
+
+    def put(self, user_id, session):
+        conn = self._conn()
+        conn.execute(
+            "INSERT OR REPLACE INTO sessions (user_id, mode, session_sn, state, last_text, last_seen, last_lang)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (user_id, session.mode, session.session_sn, session.state, session.last_text, time.time(),
+             session.last_lang)
+        )
+        conn.commit()
+        with self.lock:
+            self.writes += 1
+            need_cleanup = self.writes % self.cleanup_every == 0
+        if need_cleanup:
+            self.cleanup()
+
+    def delete(self, user_id):
+        conn = self._conn()
+        conn.execute("DELETE FROM sessions WHERE user_id = ?", (user_id,))
+        conn.commit()
+
+    # 刪除閒置過久的 session，並在超過上限時刪除最舊的
+    def cleanup(self):
+        conn = self._conn()
+        cur = conn.execute("DELETE FROM sessions WHERE last_seen <= ?", (time.time() - self.ttl,))
+        expired = cur.rowcount
+        count = conn.execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        evicted = 0
+        if count > self.max_sessions:
+            cur = conn.execute(
+                "DELETE FROM sessions WHERE user_id IN"
+                " (SELECT user_id FROM sessions ORDER BY last_seen LIMIT ?)",
+                (count - self.max_sessions,)
+            )
+            evicted = cur.rowcount
+        conn.commit()
+        with self.lock:
+            self.expired += expired
+            self.evicted += evicted
+
+    def stats(self):
+        count = self._conn().execute("SELECT COUNT(*) FROM sessions").fetchone()[0]
+        with self.lock:
+            return {
+                "backend": "sqlite",
+                "sessions": count,
+                "expired": self.expired,
+                "evicted": self.evicted,
+            }
+
+
+def create_session_store(backend="memory", ttl=3600, max_sessions=10000, max_bytes=64 * 1024 * 1024, path="sessions.db"):
+    if backend == "sqlite":
+        return SqliteSessionStore(path=path, ttl=ttl, max_sessions=max_sessions)
+    if backend == "memory":
+        return MemorySessionStore(ttl=ttl, max_sessions=max_sessions, max_bytes=max_bytes)
+    raise ValueError(f"未知的 session 後端：{backend}")
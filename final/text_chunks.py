@@ -0,0 +1,98 @@
+import re
+
+LINE_TEXT_LIMIT = 5000     # LINE 單則文字訊息的字數上限
+LINE_MAX_MESSAGES = 5      # 單次 reply / push 最多 5 則訊息
+TRUNCATED_NOTICE = "\n（內容過長，以下省略）"
+
+_PARAGRAPH_RE = re.compile(r"\n\s*\n")
+# 一個句子：到句尾標點（中英文）或換行為止，連同後面的空白
+_SENTENCE_RE = re.compile(r".+?(?:[。！？!?；;…]+|\.(?=\s)|\n|$)\s*", re.S)
+
+
+# LINE 以 UTF-16 code unit 計算長度（emoji 等算 2）
+def line_length(text):
+    return len(text.encode("utf-16-le")) // 2
+
+
+def _hard_split(text, max_chars):
+    return [text[i:i + max_chars] for i in range(0, len(text), max_chars)]
+
+
+def _sentences(paragraph, max_chars):
+    pieces = []
+    for sentence in _SENTENCE_RE.findall(paragraph):
+        if not sentence.strip():
+            continue
+        if len(sentence) > max_chars:
+            pieces.extend(_hard_split(sentence, max_chars))
+        else:
+            pieces.append(sentence)
+    return pieces
+
+
+# 依段落、句子邊界把長文切成每段不超過 max_chars 的區塊
+def split_text(text, max_chars=800):
+    chunks = []
+    current = ""
+    for paragraph in _PARAGRAPH_RE.split(text.strip()):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        # 整段放得下就整段放，盡量不拆開段落
+        candidate = f"{current}\n\n{paragraph}" if current else paragraph
+        if len(candidate) <= max_chars:
+            current = candidate
+            continue
+        if current:
+            chunks.append(current)
+            current = ""
+        if len(paragraph) <= max_chars:
+            current = paragraph
+            continue
+        for sentence in _sentences(paragraph, max_chars):
+            candidate = current + sentence
+            if len(candidate.rstrip()) <= max_chars:
+                current = candidate
+            else:
+                chunks.append(current.rstrip())
+                current = sentence
+        if current:
+            chunks.append(current.rstrip())
+            current = ""
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+# 把回覆文字裝進最少的 LINE 訊息（每則 ≤ limit，最多 max_messages 則），優先在換行處切開
+def pack_messages(text, limit=LINE_TEXT_LIMIT, max_messages=LINE_MAX_MESSAGES):
+    messages = []
+    current = ""
+    for line in text.split("\n"):
+        while line_length(line) > limit:
+            # 單行就超過上限：先把目前內容送出，再硬切
+            if current:
+                messages.append(current)
+                current = ""
+            cut = limit
+            while line_length(line[:cut]) > limit:
+                cut -= 1
+            messages.append(line[:cut])
+            line = line[cut:]
+        candidate = f"{current}\n{line}" if current else line
+        if line_length(candidate) <= limit:
+            current = candidate
+        else:
+            messages.append(current)
+            current = line
+    if current or not messages:
+        messages.append(current)
+
+    if len(messages) > max_messages:
+        messages = messages[:max_messages]
+        last = messages[-1]
+        room = limit - line_length(TRUNCATED_NOTICE)
+        while line_length(last) > room:
+            last = last[:-1]
+        messages[-1] = last + TRUNCATED_NOTICE
+    return messages
@@ -0,0 +1,129 @@
+import hashlib
+import os
+import sqlite3
+import threading
+import time
+
+from cache import normalize_text
+
+
+# 目標語言名稱正規化（去除空白、全形轉半形）
+def normalize_lang(lang):
+    return normalize_text(lang).replace(" ", "")
+
+
+# 命中時超過這麼久沒更新才寫回 last_used，避免每次命中都要寫入並 commit
+TOUCH_INTERVAL = 60
+
+
+def make_key(source_text, target_lang):
+    raw = normalize_text(source_text) + "\0" + normalize_lang(target_lang)
+    return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+
+# 翻譯記憶庫：以 (原文, 目標語言) 為 key 存在 sqlite，超過容量時淘汰最久未使用的項目
+class TranslationMemory:
+    def __init__(self, path="translation_memory.db", max_bytes=50 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY,"
+            " translation TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS idx_last_used ON translations(last_used)")
+        # 總大小存在只有一列的表：多個 gunicorn worker 共用同一個 db，與資料在同一個交易內更新
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS translation_bytes ("
+            " id INTEGER PRIMARY KEY CHECK (id = 0),"
+            " total INTEGER NOT NULL)"
+        )
+        self.conn.execute(
+            "INSERT OR IGNORE INTO translation_bytes (id, total)"
+            " SELECT 0, COALESCE(SUM(size), 0) FROM translations"
+        )
+        self.conn.commit()
+
+    def get(self, source_text, target_lang):
+        key = make_key(source_text, target_lang)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT translation, last_used FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            now = time.time()
+            if now - row[1] >= TOUCH_INTERVAL:
+                self.conn.execute("UPDATE translations SET last_used = ? WHERE key = ?", (now, key))
+                self.conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def set(self, source_text, target_lang, translation):
+        key = make_key(source_text, target_lang)
+        size = len(translation.encode('utf-8'))
+        with self.lock, self.conn:
+            # 先取得寫入鎖，讀到的舊大小與總大小在 commit 前不會被其他行程改動
+            self.conn.execute("BEGIN IMMEDIATE")
+            old = self.conn.execute(
+                "SELECT size FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO translations (key, translation, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, translation, size, time.time())
+            )
+            self._add_bytes(size - (old[0] if old else 0))
+            self._evict()
+
+    def _add_bytes(self, delta):
+        self.conn.execute("UPDATE translation_bytes SET total = total + ? WHERE id = 0", (delta,))
+
+    def _total_bytes(self):
+        return self.conn.execute("SELECT total FROM translation_bytes WHERE id = 0").fetchone()[0]
+
+    # 依 last_used 由舊到新刪除，直到總大小低於上限
+    def _evict(self):
+        total_bytes = self._total_bytes()
+        if total_bytes <= self.max_bytes:
+            return
+        freed = 0
+        while total_bytes - freed > self.max_bytes:
+            rows = self.conn.execute(
+                "SELECT key, size FROM translations ORDER BY last_used LIMIT 100"
+            ).fetchall()
+            if not rows:
+                freed = total_bytes  # 表已清空，總大小歸零
+                break
+            for key, size in rows:
+                if total_bytes - freed <= self.max_bytes:
+                    break
+                self.conn.execute("DELETE FROM translations WHERE key = ?", (key,))
+                freed += size
+                self.evictions += 1
+        self._add_bytes(-freed)
+
+    def stats(self):
+        with self.lock:
+            entries = self.conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+            lookups = self.hits + self.misses
+            return {
+                "entries": entries,
+                "bytes": self._total_bytes(),
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+            }
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict, deque
+
+
+# 一條排程通道：自己的佇列上限與同時執行上限
+class _Lane:
+    def __init__(self, name, queue_size, max_running):
+        self.name = name
+        self.queue_size = queue_size
+        self.max_running = max_running
+        self.ready = deque()  # 下一個工作屬於這條通道的 key
+        self.pending_count = 0
+        self.running = 0
+        self.processed = 0
+        self.rejected = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def stats(self):
+        avg_wait = self.total_wait / self.processed if self.processed else 0.0
+        return {
+            "running": self.running,
+            "max_running": self.max_running,
+            "queue_depth": self.pending_count,
+            "queue_capacity": self.queue_size,
+            "processed": self.processed,
+            "rejected": self.rejected,
+            "avg_wait_ms": round(avg_wait * 1000, 2),
+            "max_wait_ms": round(self.max_wait * 1000, 2),
+        }
+
+
+# 有界工作佇列 + 固定數量的背景執行緒
+# 同一個 key（例如同一位使用者）的工作依序執行，不同 key 的工作可同時執行
+# lanes 依優先順序排列：閒置的 worker 先取排在前面的通道，每條通道另有同時執行上限，
+# 讓慢的工作（圖片）不會佔滿所有 worker
+class WorkerPool:
+    def __init__(self, size=4, queue_size=100, lanes=None):
+        self.size = size
+        self.lanes = OrderedDict()
+        for name, lane_queue_size, max_running in lanes or [("default", queue_size, size)]:
+            self.lanes[name] = _Lane(name, lane_queue_size, max_running)
+        self.default_lane = next(iter(self.lanes))
+        self.pending = {}  # key → deque[(enqueued_at, lane, func, args)]
+        self.cond = threading.Condition()
+        self.failed = 0
+        self.threads = []
+
+    def start(self):
+        for i in range(self.size):
+            t = threading.Thread(target=self._run, name=f"worker-{i}", daemon=True)
+            t.start()
+            self.threads.append(t)
+
+    # 放入指定通道；該通道佇列已滿時回傳 False，不阻塞呼叫端
+    def submit(self, func, *args, key=None, lane=None):
+        lane = self.lanes[lane or self.default_lane]
+        with self.cond:
+            if lane.pending_count >= lane.queue_size:
+                lane.rejected += 1
+                return False
+            if key is None:
+                key = object()  # 沒有 key 的工作彼此獨立
+            lane.pending_count += 1
+            job = (time.monotonic(), lane, func, args)
+            key_jobs = self.pending.get(key)
+            if key_jobs is None:
+                self.pending[key] = deque([job])
+                lane.ready.append(key)
+                self.cond.notify()
+            else:
+                key_jobs.append(job)
+        return True
+
+    # 依優先順序找出有工作、且尚未達到同時執行上限的通道
+    def _next_lane(self):
+        for lane in self.lanes.values():
+            if lane.ready and lane.running < lane.max_running:
+                return lane
+        return None
+
+    def _run(self):
+        while True:
+            with self.cond:
+                lane = self._next_lane()
+                while lane is None:
+                    self.cond.wait()
+                    lane = self._next_lane()
+                key = lane.ready.popleft()
+                enqueued_at, _, func, args = self.pending[key].popleft()
+                lane.pending_count -= 1
+                lane.running += 1
+                wait = time.monotonic() - enqueued_at
+                lane.total_wait += wait
+                lane.max_wait = max(lane.max_wait, wait)
+            try:
+                func(*args)
+            except Exception as e:
+                with self.cond:
+                    self.failed += 1
+                print(f"[worker] 工作執行失敗：{e}")
+            finally:
+                # 同一 key 還有工作就排到下一個工作所屬通道的最後（讓其他使用者也有機會執行）
+                with self.cond:
+                    lane.processed += 1
+                    lane.running -= 1
+                    key_jobs = self.pending[key]
+                    if key_jobs:
+                        key_jobs[0][1].ready.append(key)
+                    else:
+                        del self.pending[key]
+                    self.cond.notify_all()
+
+    def stats(self):
+        with self.cond:
+            lanes = {name: lane.stats() for name, lane in self.lanes.items()}
+            processed = sum(lane.processed for lane in self.lanes.values())
+            total_wait = sum(lane.total_wait for lane in self.lanes.values())
+            return {
+                "workers": self.size,
+                "running": sum(lane.running for lane in self.lanes.values()),
+                "queue_depth": sum(lane.pending_count for lane in self.lanes.values()),
+                "queue_capacity": sum(lane.queue_size for lane in self.lanes.values()),
+                "active_keys": len(self.pending),
+                "processed": processed,
+                "rejected": sum(lane.rejected for lane in self.lanes.values()),
+                "failed": self.failed,
+                "avg_wait_ms": round(total_wait / processed * 1000, 2) if processed else 0.0,
+                "max_wait_ms": round(max(lane.max_wait for lane in self.lanes.values()) * 1000, 2),
+                "lanes": lanes,
+            }
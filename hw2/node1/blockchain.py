@@ -1,71 +1,206 @@
 import hashlib
 import os
+import threading
+from storage import SegmentStore
+from ledger import BalanceLedger
+from history import HistoryIndex
+
+MAX_TRANSACTIONS = 5  # 每個區塊最多幾筆交易
 
 class Block:
     def __init__(self, transactions, previous_hash, next_block=None):
         self.transactions = transactions
         self.previous_hash = previous_hash.strip()
-        self.hash = None  # 初始為 None，等區塊寫入檔案後再用檔案內容計算
+        self.hash = None     # 由區塊內容（與 N.txt 相同的文字）計算
+        self.content = None
+        self.stored = False  # 目前內容是否已封存到 segment 檔
         self.next_block = next_block
 
-    def calculate_hash_from_file(self, filepath):
-        with open(filepath, 'r', encoding='utf-8') as f:
-            content = f.read()
-        return hashlib.sha256(content.encode()).hexdigest()
+    # 與原本 N.txt 完全相同的格式，hash 才會跟其他節點一致
+    def serialize(self, number):
+        lines = [f"Sha256 of previous block: {self.previous_hash}\n", f"Next block: {number+1}.txt\n"]
+        lines.extend(tx.strip() + "\n" for tx in self.transactions)
+        return "".join(lines)
+
+    # 內容變動後重新產生文字並直接從記憶體計算 hash，不必寫檔再讀回來
+    def update_content(self, number):
+        self.content = self.serialize(number)
+        self.hash = hashlib.sha256(self.content.encode()).hexdigest()
+        self.stored = False
+
+    # 從 N.txt 格式的文字建立區塊（同步收到的內容原樣保留，hash 不變）
+    @classmethod
+    def from_content(cls, content):
+        lines = content.splitlines()
+        prev_hash = lines[0].replace("Sha256 of previous block: ", "").strip()
+        transactions = [line.strip() for line in lines[2:]]
+        block = cls(transactions, prev_hash)
+        block.content = content
+        block.hash = hashlib.sha256(content.encode()).hexdigest()
+        return block
 
 class Blockchain:
-    def __init__(self):
+    def __init__(self, storage_dir="chain_data"):
         self.head = None
         self.tail = None
         self.blocks = []
+        self.storage_dir = storage_dir
+        self.store = None
+        self.ledger = BalanceLedger(os.path.join(storage_dir, "ledger.log"))
+        self.history = HistoryIndex(os.path.join(storage_dir, "history.log"))
+        self.lock = threading.RLock()  # 收廣播的執行緒與指令列會同時寫入
 
-    def add_block(self, transactions):
-        previous_hash = self.blocks[-1].hash if self.blocks else "None"
-        block = Block(transactions, previous_hash)
+    # 從 segment 檔與 WAL 載入；第一次啟動且目錄下有舊的 N.txt 時自動匯入
+    def load(self):
+        with self.lock:
+            if self.store is None:
+                self.store = SegmentStore(self.storage_dir)
+            self.blocks = []
+            self.head = None
+            self.tail = None
+
+            if self.store.is_empty() and os.path.exists("1.txt"):
+                print("偵測到 N.txt 格式的區塊，匯入 segment 儲存…")
+                self.import_from_files(".")
+                self.ledger.load(self.blocks)
+                self.history.load(self.blocks)
+                return
+
+            for number in range(1, self.store.count() + 1):
+                block = Block.from_content(self.store.read(number))
+                block.stored = True
+                self._link(block)
+
+            # WAL 裡是最後一個（尚未封存）區塊：編號是下一個就接上去，同編號代表封存後又有變動
+            open_block = self.store.read_open_block()
+            if open_block is not None:
+                number, content = open_block
+                if number == len(self.blocks) + 1:
+                    self._link(Block.from_content(content))
+                elif number == len(self.blocks) and content != self.blocks[-1].content:
+                    self._replace(number, content)
+            self.ledger.load(self.blocks)
+            self.history.load(self.blocks)
+
+    def _link(self, block):
         if self.blocks:
             self.blocks[-1].next_block = block
+        else:
+            self.head = block
         self.blocks.append(block)
-        self.save_new_block_to_file(block)
-
-    def save_new_block_to_file(self, block):
-        index = len(self.blocks)
-        filename = f"{index}.txt"
-        next_block_name = f"{index+1}.txt"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(f"Sha256 of previous block: {block.previous_hash}\n")
-            f.write(f"Next block: {next_block_name}\n")
-            for tx in block.transactions:
-                f.write(tx.strip() + "\n")
-        block.hash = block.calculate_hash_from_file(filename)
-
-    def load_from_files(self):
-        i = 1
-        self.blocks = []
-        self.head = None
-        prev_block = None
+        self.tail = block
+
+    def add_block(self, transactions):
+        with self.lock:
+            previous_hash = self.blocks[-1].hash if self.blocks else "None"
+            block = Block(transactions, previous_hash)
+            block.update_content(len(self.blocks) + 1)
+            self._open_block(block)
+
+    # 新區塊成為最後一個：先封存前一個區塊，再把 WAL 換成新區塊
+    def _open_block(self, block):
+        if self.blocks and not self.blocks[-1].stored:
+            last = self.blocks[-1]
+            self.store.append(len(self.blocks), last.content)
+            last.stored = True
+            self._checkpoint(len(self.blocks), last)
+        self._link(block)
+        self._reindex(len(self.blocks), block.transactions)
+        self.store.reset_open_block(len(self.blocks), block.content)
+
+    # 新增一筆交易：最後一個區塊滿了就開新區塊，回傳寫入的區塊編號
+    def append_transaction(self, tx):
+        with self.lock:
+            if not self.blocks or len(self.blocks[-1].transactions) >= MAX_TRANSACTIONS:
+                self.add_block([tx])
+            else:
+                block = self.blocks[-1]
+                block.transactions.append(tx)
+                block.update_content(len(self.blocks))
+                self.store.write_open_block(len(self.blocks), block.content)
+                self.ledger.apply(len(self.blocks), tx)
+                self.history.add(len(self.blocks), len(block.transactions) - 1, tx)
+            return len(self.blocks)
 
-        while True:
-            filename = f"{i}.txt"
-            if not os.path.exists(filename):
-                break
+    # 餘額帳本與交易紀錄索引跟著區塊內容更新
+    def _reindex(self, number, transactions):
+        self.ledger.replace(number, transactions)
+        self.history.replace(number, transactions)
 
-            with open(filename, 'r', encoding='utf-8') as f:
-                lines = f.read().splitlines()
-                prev_hash_line = lines[0]
-                prev_hash = prev_hash_line.replace("Sha256 of previous block: ", "").strip()
-                transactions = [line.strip() for line in lines[2:]]
+    def _checkpoint(self, number, block):
+        self.ledger.checkpoint(number, block.hash)
+        self.history.checkpoint(number, block.hash)
 
-                block = Block(transactions, prev_hash)
-                block.hash = block.calculate_hash_from_file(filename)
+    # 帳戶的交易紀錄，由新到舊分頁：回傳 ([(區塊編號, 交易)], 總筆數)
+    def transaction_log(self, user, page=1, page_size=10):
+        with self.lock:
+            items = [(number, self.blocks[number - 1].transactions[pos])
+                     for number, pos in self.history.query(user, page, page_size)]
+            return items, self.history.count(user)
 
-                if not self.blocks:
-                    self.head = block
-                else:
-                    prev_block.next_block = block
+    def balance(self, user):
+        return self.ledger.balance(user)
 
-                self.blocks.append(block)
-                prev_block = block
+    # 與完整重算的結果比對；不一致時以重算結果重建帳本與 checkpoint
+    def verify_ledger(self):
+        with self.lock:
+            mismatches = self.ledger.verify(self.blocks)
+            if mismatches:
+                self.ledger.rebuild(self.blocks)
+            return mismatches
+
+    # 以 N.txt 格式的內容取代第 index 個區塊（從 0 開始，與同步訊息一致）
+    def replace_block(self, index, content):
+        with self.lock:
+            number = index + 1
+            if number <= len(self.blocks):
+                # 內容相同（checkAllChains 會同步每個區塊）就不必再寫一次
+                if content != self.blocks[number - 1].content:
+                    self._replace(number, content)
+            elif number == len(self.blocks) + 1:
+                self._open_block(Block.from_content(content))
+            else:
+                print(f"Block {number} 之前還有缺少的區塊，略過同步")
+
+    def _replace(self, number, content):
+        new_block = Block.from_content(content)
+        block = self.blocks[number - 1]
+        block.transactions = new_block.transactions
+        block.previous_hash = new_block.previous_hash
+        block.content = new_block.content
+        block.hash = new_block.hash
+        self._reindex(number, block.transactions)
+        if number == len(self.blocks):
+            block.stored = False
+            self.store.write_open_block(number, content)
+        else:
+            self.store.append(number, content)
+            block.stored = True
+            self._checkpoint(number, block)
+
+    def block_content(self, index):
+        return self.blocks[index].content
+
+    # 轉換工具：匯入 / 匯出原本每個區塊一個 N.txt 的格式
+    def import_from_files(self, directory="."):
+        with self.lock:
+            i = 1
+            while True:
+                filename = os.path.join(directory, f"{i}.txt")
+                if not os.path.exists(filename):
+                    break
+                with open(filename, 'r', encoding='utf-8') as f:
+                    self._open_block(Block.from_content(f.read()))
                 i += 1
+            print(f"已匯入 {i-1} 個區塊")
+
+    def export_to_files(self, directory="."):
+        with self.lock:
+            os.makedirs(directory, exist_ok=True)
+            for number, block in enumerate(self.blocks, start=1):
+                with open(os.path.join(directory, f"{number}.txt"), 'w', encoding='utf-8', newline='') as f:
+                    f.write(block.content)
+            print(f"已匯出 {len(self.blocks)} 個區塊")
 
     def calculate_hash(self, content):
         return hashlib.sha256(content.encode()).hexdigest()
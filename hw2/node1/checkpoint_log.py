@@ -0,0 +1,56 @@
+import json
+import os
+
+# 檔案行數超過區塊數的兩倍（且至少這麼多行）時整檔重寫
+COMPACT_MIN_LINES = 100
+
+
+# 以區塊編號為 key 的 checkpoint 紀錄檔（每行一筆 JSON，同一區塊以最後一筆為準）
+# 區塊被同步覆蓋時只會附加新的一筆，舊紀錄累積太多時重寫成每個區塊一筆
+class CheckpointLog:
+    def __init__(self, path):
+        self.path = path
+        self.records = None  # 區塊編號 → 最新紀錄，第一次讀檔後保留
+        self.lines = 0       # 檔案目前的行數
+
+    def read(self):
+        records = {}
+        lines = 0
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        record = json.loads(line)
+                    except ValueError:
+                        continue  # 寫到一半的最後一行
+                    records[record["block"]] = record
+        self.records = records
+        self.lines = lines
+        return dict(records)
+
+    def append(self, record):
+        if self.records is None:
+            self.read()
+        line = json.dumps(record, ensure_ascii=False)
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+        self.records[record["block"]] = json.loads(line)  # 與讀檔得到的內容相同，不受之後修改影響
+        self.lines += 1
+        if self.lines >= max(COMPACT_MIN_LINES, 2 * len(self.records)):
+            self.compact()
+
+    # 先寫暫存檔再取代，重寫到一半當機時舊檔仍完整
+    def rewrite(self, records):
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        os.replace(tmp_path, self.path)
+        self.records = {record["block"]: record for record in records}
+        self.lines = len(self.records)
+
+    def compact(self):
+        if self.records is None:
+            self.read()
+        self.rewrite([self.records[number] for number in sorted(self.records)])
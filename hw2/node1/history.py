@@ -0,0 +1,79 @@
+import bisect
+from checkpoint_log import CheckpointLog
+from ledger import parse_transaction
+
+
+# 一筆交易牽涉到的帳戶（sender 與 receiver 相同時只算一次）
+def _accounts(tx):
+    parsed = parse_transaction(tx)
+    if parsed is None:
+        return []
+    return list(dict.fromkeys(parsed[:2]))
+
+
+# 帳戶交易紀錄索引：帳戶 → [(區塊編號, 區塊內第幾筆)]，依鏈上順序排列
+# 封存的區塊把自己的索引附加到 history.log，重啟時 hash 相符的區塊不必重新解析交易
+class HistoryIndex:
+    def __init__(self, path="chain_data/history.log"):
+        self.path = path
+        self.log = CheckpointLog(path)
+        self.entries = {}  # 帳戶 → [(區塊編號, 位置)]
+        self.blocks = []   # 第 i 個元素是第 i+1 個區塊的 [(帳戶, 位置)]
+
+    def _ensure(self, number):
+        while len(self.blocks) < number:
+            self.blocks.append([])
+
+    def _insert(self, number, account, pos):
+        bisect.insort(self.entries.setdefault(account, []), (number, pos))
+        self.blocks[number - 1].append((account, pos))
+
+    # 最後一個區塊新增第 pos 筆交易
+    def add(self, number, pos, tx):
+        self._ensure(number)
+        for account in _accounts(tx):
+            self._insert(number, account, pos)
+
+    # 區塊被同步覆蓋：移除舊的索引後重新加入
+    def replace(self, number, transactions):
+        self._ensure(number)
+        for account, pos in self.blocks[number - 1]:
+            history = self.entries[account]
+            del history[bisect.bisect_left(history, (number, pos))]
+            if not history:
+                del self.entries[account]
+        self.blocks[number - 1] = []
+        for pos, tx in enumerate(transactions):
+            for account in _accounts(tx):
+                self._insert(number, account, pos)
+
+    def checkpoint(self, number, block_hash):
+        self.log.append({"block": number, "hash": block_hash, "accounts": self.blocks[number - 1]})
+
+    def load(self, blocks):
+        saved = self.log.read()
+        self.entries = {}
+        self.blocks = []
+        rebuilt = []
+        for number, block in enumerate(blocks, start=1):
+            self._ensure(number)
+            record = saved.get(number)
+            if record is not None and record["hash"] == block.hash:
+                for account, pos in record["accounts"]:
+                    self._insert(number, account, pos)
+            else:
+                self.replace(number, block.transactions)
+                if block.stored:
+                    rebuilt.append((number, block.hash))
+        for number, block_hash in rebuilt:
+            self.checkpoint(number, block_hash)
+
+    def count(self, account):
+        return len(self.entries.get(account, []))
+
+    # 由新到舊分頁查詢（page 從 1 開始），只走訪這個帳戶自己的紀錄
+    def query(self, account, page=1, page_size=10):
+        history = self.entries.get(account, [])
+        page = max(1, page)
+        start = len(history) - (page - 1) * page_size
+        return [history[i] for i in range(start - 1, max(start - page_size, 0) - 1, -1)]
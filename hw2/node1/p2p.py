@@ -1,11 +1,12 @@
 import socket
 import threading
-import os
 import sys
 import time
 import json
 from blockchain import Blockchain
 
+LOG_PAGE_SIZE = 10  # checkLog 每頁筆數
+
 class P2PNode:
     def __init__(self, self_ip, port):
         self.self_ip = self_ip
@@ -13,7 +14,7 @@ class P2PNode:
         self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
         self.sock.bind(('0.0.0.0', self.port))
         self.blockchain = Blockchain()
-        self.blockchain.load_from_files()
+        self.blockchain.load()
         all_peers = [('172.17.0.2', 8001), ('172.17.0.3', 8001), ('172.17.0.4', 8001)]
         self.peers = [peer for peer in all_peers if peer[0] != self.self_ip]
         self.received_chains = {}
@@ -51,31 +52,20 @@ class P2PNode:
             elif msg.startswith("TRANSACTION_BROADCAST: "):
                 tx = msg.replace("TRANSACTION_BROADCAST: ", "").strip()
                 print(f"Received broadcast transaction: {tx}")
-                if not self.blockchain.blocks or len(self.blockchain.blocks[-1].transactions) >= 5:
-                    self.blockchain.add_block([tx])
-                else:
-                    self.blockchain.blocks[-1].transactions.append(tx)
-                self.blockchain.save_new_block_to_file(self.blockchain.blocks[-1])
+                self.blockchain.append_transaction(tx)
 
             elif msg.startswith("REWARD_BROADCAST: "):
                 reward_tx = msg.replace("REWARD_BROADCAST: ", "").strip()
                 print(f"Received reward broadcast: {reward_tx}")
-                if not self.blockchain.blocks or len(self.blockchain.blocks[-1].transactions) >= 5:
-                    self.blockchain.add_block([reward_tx])
-                else:
-                    self.blockchain.blocks[-1].transactions.append(reward_tx)
-                self.blockchain.save_new_block_to_file(self.blockchain.blocks[-1])
+                self.blockchain.append_transaction(reward_tx)
 
             else:
                 print(f"Received unknown message: {msg}")
 
     def _send_full_chain(self, addr):
-        files = sorted([f for f in os.listdir('.') if f.endswith('.txt') and f[:-4].isdigit()], key=lambda x: int(x[:-4]))
-        for fname in files:
-            with open(fname, 'r', encoding='utf-8') as f:
-                content = f.read()
-                msg = f"CHAIN:{fname}\n{content}"
-                self.sock.sendto(msg.encode('utf-8'), addr)
+        for i, block in enumerate(self.blockchain.blocks):
+            msg = f"CHAIN:{i+1}.txt\n{block.content}"
+            self.sock.sendto(msg.encode('utf-8'), addr)
 
     def _command_interface(self):
         while True:
@@ -86,8 +76,15 @@ class P2PNode:
             cmd = parts[0]
             if cmd == "checkMoney" and len(parts) == 2:
                 self._check_money(parts[1])
-            elif cmd == "checkLog" and len(parts) == 2:
-                self._check_log(parts[1])
+            elif cmd == "checkLog" and len(parts) in (2, 3):
+                try:
+                    page = int(parts[2]) if len(parts) == 3 else 1
+                except ValueError:
+                    page = 0
+                if page < 1:
+                    print("Invalid page. Please enter a number.")
+                else:
+                    self._check_log(parts[1], page)
             elif cmd == "transaction" and len(parts) == 4:
                 sender = parts[1]
                 receiver = parts[2]
@@ -104,54 +101,28 @@ class P2PNode:
                 print("Unknown or malformed command.")
 
     def _check_money(self, user):
-        balances = {}
-        for block in self.blockchain.blocks:
-            for tx in block.transactions:
-                parts = tx.split(', ')
-                if len(parts) == 3:
-                    s, r, a = parts[0], parts[1], int(parts[2])
-                    if s != "angel":
-                        balances[s] = balances.get(s, 0) - a
-                    balances[r] = balances.get(r, 0) + a
-        print(f"{user}: {balances.get(user, 0)}")
-
-    def _check_log(self, user):
-        found = False
-        for i, block in enumerate(self.blockchain.blocks):
-            for tx in block.transactions:
-                parts = tx.split(', ')
-                if len(parts) == 3:
-                    sender, receiver, amount = parts[0], parts[1], parts[2]
-                    if sender == user or receiver == user:
-                        print(f"[Block {i+1}.txt]: {sender} → {receiver} : {amount}")
-                        found = True
-        if not found:
+        print(f"{user}: {self.blockchain.balance(user)}")
+
+    # 由新到舊列出，每頁 LOG_PAGE_SIZE 筆：checkLog <user> [page]
+    def _check_log(self, user, page=1):
+        items, total = self.blockchain.transaction_log(user, page, LOG_PAGE_SIZE)
+        if total == 0:
             print(f"{user} No transaction!")
+            return
+        for number, tx in items:
+            sender, receiver, amount = tx.split(', ')
+            print(f"[Block {number}.txt]: {sender} → {receiver} : {amount}")
+        pages = (total + LOG_PAGE_SIZE - 1) // LOG_PAGE_SIZE
+        print(f"Page {page}/{pages}, {total} transactions")
 
     def _transaction(self, sender, receiver, amount):
-        balances = {}
-        for block in self.blockchain.blocks:
-            for tx in block.transactions:
-                parts = tx.split(', ')
-                if len(parts) == 3:
-                    s, r, a = parts[0], parts[1], int(parts[2])
-                    if s != "angel":
-                        balances[s] = balances.get(s, 0) - a
-                    balances[r] = balances.get(r, 0) + a
-
-        if sender != "angel" and balances.get(sender, 0) < amount:
-            print(f"Transaction failed: {sender}, Not enough amount: {balances.get(sender, 0)}")
+        balance = self.blockchain.balance(sender)
+        if sender != "angel" and balance < amount:
+            print(f"Transaction failed: {sender}, Not enough amount: {balance}")
             return
 
         transaction = f"{sender}, {receiver}, {amount}"
-        if not self.blockchain.blocks or len(self.blockchain.blocks[-1].transactions) >= 5:
-            self.blockchain.add_block([transaction])
-            block_index = len(self.blockchain.blocks)
-        else:
-            self.blockchain.blocks[-1].transactions.append(transaction)
-            block_index = len(self.blockchain.blocks)
-
-        self.blockchain.save_new_block_to_file(self.blockchain.blocks[-1])
+        block_index = self.blockchain.append_transaction(transaction)
         print(f"Transaction success, written in {block_index}.txt")
 
         for peer in self.peers:
@@ -171,29 +142,24 @@ class P2PNode:
         result = validate_blockchain(self.blockchain)
         if result == 0:
             print("OK")
+            # 順便用完整重算核對餘額帳本
+            mismatches = self.blockchain.verify_ledger()
+            if mismatches:
+                print(f"餘額帳本與重算結果不一致，已重建：{mismatches}")
             angel_tx = f"angel, {checker}, 10"
             self._add_reward_and_broadcast(angel_tx)
         else:
             print(f"帳本鍊受損，不給予獎勵")
 
     def _add_reward_and_broadcast(self, reward_tx):
-        if not self.blockchain.blocks or len(self.blockchain.blocks[-1].transactions) >= 5:
-            self.blockchain.add_block([reward_tx])
-        else:
-            self.blockchain.blocks[-1].transactions.append(reward_tx)
-        self.blockchain.save_new_block_to_file(self.blockchain.blocks[-1])
+        self.blockchain.append_transaction(reward_tx)
         print(f"Reward transaction written: {reward_tx}")
         for peer in self.peers:
             msg = f"REWARD_BROADCAST: {reward_tx}"
             self.sock.sendto(msg.encode('utf-8'), peer)
 
     def _gather_blockchain_contents(self):
-        contents = []
-        files = sorted([f for f in os.listdir('.') if f.endswith('.txt') and f[:-4].isdigit()], key=lambda x: int(x[:-4]))
-        for fname in files:
-            with open(fname, 'r', encoding='utf-8') as f:
-                contents.append(f.read())
-        return contents
+        return [block.content for block in self.blockchain.blocks]
 
     def _compare_hashes(self):
         nodes = list(self.received_chains.keys())
@@ -237,10 +203,7 @@ class P2PNode:
         print("系統不被信任")    
 
     def _sync_block(self, index, content):
-        filename = f"{index+1}.txt"
-        with open(filename, 'w', encoding='utf-8') as f:
-            f.write(content)
-        self.blockchain.load_from_files()
+        self.blockchain.replace_block(index, content)
         print(f"Block {index+1}同步完成。")
 
     def _check_all_chains(self, checker):
@@ -0,0 +1,221 @@
+import os
+import struct
+
+# 每筆紀錄：區塊編號 + 內容長度，後面接區塊內容（與 N.txt 內容相同的 UTF-8 文字）
+RECORD_HEADER = struct.Struct(">II")
+# 索引：區塊編號、segment 編號、紀錄起點、內容長度
+INDEX_ENTRY = struct.Struct(">IIQI")
+# WAL 累積這麼多筆後改寫成只剩最新一筆
+WAL_MAX_RECORDS = 64
+
+
+# 區塊儲存引擎：封存的區塊依序附加到 segment 檔，另有位移索引；
+# 尚未封存（還會加交易）的最後一個區塊寫在 write-ahead log
+# 同步覆蓋留下的舊紀錄（dead bytes）超過仍在使用的資料量時，重寫成每個區塊一筆
+class SegmentStore:
+    def __init__(self, directory="chain_data", segment_size=4 * 1024 * 1024, fsync=True,
+                 compact_min_bytes=1024 * 1024):
+        self.directory = directory
+        self.segment_size = segment_size
+        self.fsync = fsync
+        self.compact_min_bytes = compact_min_bytes
+        self.index = {}  # 區塊編號 → (segment, offset, length)
+        self.readers = {}
+        os.makedirs(directory, exist_ok=True)
+
+        self.index_file = open(self._path("index.dat"), "a+b")
+        self._load_index()
+        self._recover_segments()
+        self.segment_no = max(self._segment_numbers() or [1])
+        self.segment_file = open(self._segment_path(self.segment_no), "ab")
+        self.live_bytes = sum(RECORD_HEADER.size + length for _, _, length in self.index.values())
+        total = sum(os.path.getsize(self._segment_path(n)) for n in self._segment_numbers())
+        self.dead_bytes = total - self.live_bytes
+        self.wal_records = 0
+        self.open_block = self._recover_wal()
+        self.wal_file = open(self._path("open_block.wal"), "ab")
+
+    def _path(self, name):
+        return os.path.join(self.directory, name)
+
+    def _segment_path(self, number):
+        return self._path(f"segment-{number:05d}.log")
+
+    def _segment_numbers(self):
+        numbers = []
+        for name in os.listdir(self.directory):
+            if name.startswith("segment-") and name.endswith(".log"):
+                numbers.append(int(name[8:-4]))
+        return sorted(numbers)
+
+    def _sync(self, f):
+        f.flush()
+        if self.fsync:
+            os.fsync(f.fileno())
+
+    def _load_index(self):
+        self.index_file.seek(0)
+        data = self.index_file.read()
+        # 最後一筆沒寫完就丟掉
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        if usable != len(data):
+            self.index_file.truncate(usable)
+        self.indexed_end = (0, 0)  # 索引涵蓋到的 (segment, 結尾位置)
+        for pos in range(0, usable, INDEX_ENTRY.size):
+            block_no, segment, offset, length = INDEX_ENTRY.unpack_from(data, pos)
+            self.index[block_no] = (segment, offset, length)
+            self.indexed_end = max(self.indexed_end, (segment, offset + RECORD_HEADER.size + length))
+
+    # 寫入 segment 後、寫入索引前當機：從索引結尾往後掃描補回，截掉寫到一半的紀錄
+    def _recover_segments(self):
+        last_segment, last_end = self.indexed_end
+        for segment in self._segment_numbers():
+            if segment < last_segment:
+                continue
+            path = self._segment_path(segment)
+            pos = last_end if segment == last_segment else 0
+            with open(path, "r+b") as f:
+                f.seek(pos)
+                while True:
+                    header = f.read(RECORD_HEADER.size)
+                    if len(header) < RECORD_HEADER.size:
+                        break
+                    block_no, length = RECORD_HEADER.unpack(header)
+                    if len(f.read(length)) < length:
+                        break
+                    self._write_index(block_no, segment, pos, length)
+                    pos += RECORD_HEADER.size + length
+                f.truncate(pos)
+
+    def _write_index(self, block_no, segment, offset, length):
+        self.index_file.write(INDEX_ENTRY.pack(block_no, segment, offset, length))
+        self._sync(self.index_file)
+        self.index[block_no] = (segment, offset, length)
+
+    def count(self):
+        return len(self.index)
+
+    def is_empty(self):
+        return not self.index and self.read_open_block() is None
+
+    # 封存一個區塊；同一編號再次寫入（同步覆蓋）時以最新的紀錄為準
+    def append(self, block_no, content):
+        data = content.encode("utf-8")
+        offset = self._write_record(block_no, data)
+        self._sync(self.segment_file)
+        old = self.index.get(block_no)
+        if old is not None:
+            self.live_bytes -= RECORD_HEADER.size + old[2]
+            self.dead_bytes += RECORD_HEADER.size + old[2]
+        self.live_bytes += RECORD_HEADER.size + len(data)
+        self._write_index(block_no, self.segment_no, offset, len(data))
+        if self.dead_bytes >= max(self.compact_min_bytes, self.live_bytes):
+            self.compact()
+
+    # 寫到目前的 segment 檔（超過大小就換下一個），回傳紀錄起點
+    def _write_record(self, block_no, data):
+        if self.segment_file.tell() >= self.segment_size:
+            self._sync(self.segment_file)
+            self.segment_file.close()
+            self.segment_no += 1
+            self.segment_file = open(self._segment_path(self.segment_no), "ab")
+        offset = self.segment_file.tell()
+        self.segment_file.write(RECORD_HEADER.pack(block_no, len(data)) + data)
+        return offset
+
+    # 把每個區塊最新的紀錄依序寫到新的 segment 檔，換上新索引後刪除舊檔
+    # 換索引前當機：重啟時從新檔補回的索引指向相同內容，舊檔留到下次壓縮再刪
+    def compact(self):
+        old_segments = self._segment_numbers()
+        self._sync(self.segment_file)
+        self.segment_file.close()
+        self.segment_no += 1
+        first_segment = self.segment_no
+        self.segment_file = open(self._segment_path(self.segment_no), "ab")
+        index = {}
+        for block_no in sorted(self.index):
+            data = self.read(block_no).encode("utf-8")
+            offset = self._write_record(block_no, data)
+            index[block_no] = (self.segment_no, offset, len(data))
+        self._sync(self.segment_file)
+
+        tmp_path = self._path("index.dat.tmp")
+        with open(tmp_path, "wb") as f:
+            for block_no, (segment, offset, length) in index.items():
+                f.write(INDEX_ENTRY.pack(block_no, segment, offset, length))
+            self._sync(f)
+        self.index_file.close()
+        os.replace(tmp_path, self._path("index.dat"))
+        self.index_file = open(self._path("index.dat"), "a+b")
+        self.index = index
+
+        for f in self.readers.values():
+            f.close()
+        self.readers = {}
+        for segment in old_segments:
+            if segment < first_segment:
+                os.remove(self._segment_path(segment))
+        self.dead_bytes = 0
+
+    def read(self, block_no):
+        segment, offset, length = self.index[block_no]
+        f = self.readers.get(segment)
+        if f is None:
+            f = open(self._segment_path(segment), "rb")
+            self.readers[segment] = f
+        f.seek(offset + RECORD_HEADER.size)
+        return f.read(length).decode("utf-8")
+
+    # 最後一個區塊每次變動都附加一筆到 WAL
+    def write_open_block(self, block_no, content):
+        if self.wal_records >= WAL_MAX_RECORDS:
+            self.reset_open_block(block_no, content)
+            return
+        data = content.encode("utf-8")
+        self.wal_file.write(RECORD_HEADER.pack(block_no, len(data)) + data)
+        self._sync(self.wal_file)
+        self.wal_records += 1
+        self.open_block = (block_no, content)
+
+    # 換成新的最後一個區塊：先寫暫存檔再取代，WAL 只留新區塊一筆
+    def reset_open_block(self, block_no, content):
+        data = content.encode("utf-8")
+        tmp_path = self._path("open_block.wal.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(RECORD_HEADER.pack(block_no, len(data)) + data)
+            self._sync(f)
+        self.wal_file.close()
+        os.replace(tmp_path, self._path("open_block.wal"))
+        self.wal_file = open(self._path("open_block.wal"), "ab")
+        self.wal_records = 1
+        self.open_block = (block_no, content)
+
+    # 重啟時取 WAL 最後一筆完整的紀錄，並截掉寫到一半的尾端
+    def _recover_wal(self):
+        latest = None
+        path = self._path("open_block.wal")
+        if not os.path.exists(path):
+            return None
+        with open(path, "r+b") as f:
+            pos = 0
+            while True:
+                header = f.read(RECORD_HEADER.size)
+                if len(header) < RECORD_HEADER.size:
+                    break
+                block_no, length = RECORD_HEADER.unpack(header)
+                data = f.read(length)
+                if len(data) < length:
+                    break
+                latest = (block_no, data.decode("utf-8"))
+                self.wal_records += 1
+                pos += RECORD_HEADER.size + length
+            f.truncate(pos)
+        return latest
+
+    def read_open_block(self):
+        return self.open_block
+
+    def close(self):
+        for f in [self.index_file, self.segment_file, self.wal_file] + list(self.readers.values()):
+            f.close()
+        self.readers = {}
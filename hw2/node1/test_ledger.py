@@ -0,0 +1,118 @@
+import json
+
+from blockchain import Block, Blockchain
+
+
+def _open_chain():
+    chain = Blockchain(storage_dir="chain_data")
+    chain.load()
+    return chain
+
+
+def _restart(chain):
+    chain.store.close()
+    return _open_chain()
+
+
+# 以指定交易產生第 number 個區塊的 N.txt 內容
+def _block_content(chain, number, transactions):
+    previous_hash = chain.blocks[number - 2].hash if number > 1 else "None"
+    return Block(transactions, previous_hash).serialize(number)
+
+
+def _fill(chain):
+    for user in ["alice", "bob", "carol"]:
+        chain.append_transaction(f"angel, {user}, 100")
+    for i in range(20):
+        chain.append_transaction(f"alice, bob, {i + 1}")
+        chain.append_transaction(f"bob, carol, {i}")
+
+
+def test_ledger_survives_append_replace_and_restart(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)  # 目錄下沒有 N.txt，不會自動匯入
+    chain = _open_chain()
+    _fill(chain)
+    assert len(chain.blocks) == 9
+    assert chain.ledger.verify(chain.blocks) == {}
+
+    # 同步覆蓋一個已封存的區塊與最後一個區塊
+    chain.replace_block(1, _block_content(chain, 2, ["angel, dave, 50", "carol, alice, 7"]))
+    last = len(chain.blocks)
+    chain.replace_block(last - 1, _block_content(chain, last, ["bob, dave, 3"]))
+    assert chain.ledger.verify(chain.blocks) == {}
+    assert chain.balance("dave") == 53
+
+    balances = dict(chain.ledger.balances)
+    chain = _restart(chain)
+    assert chain.ledger.balances == balances
+    assert chain.ledger.verify(chain.blocks) == {}
+
+
+def test_verify_ledger_rewrites_bad_checkpoint(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chain = _open_chain()
+    _fill(chain)
+    balances = dict(chain.ledger.balances)
+    chain.store.close()
+
+    # 竄改第 2 個區塊的 checkpoint：hash 仍相符，重啟時會直接採用錯誤的 delta
+    path = tmp_path / "chain_data" / "ledger.log"
+    records = [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines()]
+    for record in records:
+        if record["block"] == 2:
+            record["deltas"]["alice"] += 1000
+    path.write_text("".join(json.dumps(r) + "\n" for r in records), encoding="utf-8")
+
+    chain = _open_chain()
+    assert chain.verify_ledger() == {"alice": (balances["alice"] + 1000, balances["alice"])}
+    assert chain.ledger.balances == balances
+
+    chain = _restart(chain)
+    assert chain.ledger.balances == balances
+    assert chain.ledger.verify(chain.blocks) == {}
+
+
+def test_checkpoint_logs_compact_after_repeated_syncs(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chain = _open_chain()
+    _fill(chain)
+    for i in range(200):
+        chain.replace_block(1, _block_content(chain, 2, [f"angel, dave, {i}"]))
+    balances = dict(chain.ledger.balances)
+
+    for name in ["ledger.log", "history.log"]:
+        lines = (tmp_path / "chain_data" / name).read_text(encoding="utf-8").splitlines()
+        assert len(lines) <= 100
+    chain = _restart(chain)
+    assert chain.ledger.balances == balances
+    assert chain.balance("dave") == 199
+    assert chain.transaction_log("dave") == ([(2, "angel, dave, 199")], 1)
+
+
+def test_identical_sync_does_not_grow_storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chain = _open_chain()
+    for i in range(50):
+        chain.append_transaction(f"angel, alice, {i}")
+    data_dir = tmp_path / "chain_data"
+    sizes = {p.name: p.stat().st_size for p in data_dir.iterdir()}
+    for _ in range(3):
+        for index in range(len(chain.blocks)):
+            chain.replace_block(index, chain.block_content(index))
+    assert {p.name: p.stat().st_size for p in data_dir.iterdir()} == sizes
+
+
+def test_segment_compaction_keeps_latest_blocks(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    chain = _open_chain()
+    chain.store.compact_min_bytes = 0
+    _fill(chain)
+    for i in range(30):
+        chain.replace_block(1, _block_content(chain, 2, [f"angel, dave, {i}"]))
+    contents = [block.content for block in chain.blocks]
+    segments = sorted((tmp_path / "chain_data").glob("segment-*.log"))
+    assert sum(p.stat().st_size for p in segments) < 2 * sum(len(c.encode()) + 8 for c in contents)
+
+    chain = _restart(chain)
+    assert [block.content for block in chain.blocks] == contents
+    assert chain.ledger.verify(chain.blocks) == {}
@@ -0,0 +1,23 @@
+import sys
+from blockchain import Blockchain
+
+# 在 N.txt 格式與 segment 儲存之間轉換
+#   python3 convert.py import [目錄]   把目錄下的 1.txt, 2.txt, ... 匯入 chain_data/
+#   python3 convert.py export [目錄]   把 chain_data/ 的區塊寫回 1.txt, 2.txt, ...
+if __name__ == '__main__':
+    if len(sys.argv) not in (2, 3) or sys.argv[1] not in ("import", "export"):
+        print("Usage: python3 convert.py import|export [directory]")
+        sys.exit(1)
+
+    directory = sys.argv[2] if len(sys.argv) == 3 else "."
+    blockchain = Blockchain()
+    # chain_data/ 是空的且目前目錄有 1.txt 時，load() 會自動匯入
+    blockchain.load()
+    if sys.argv[1] == "import":
+        if directory != ".":
+            if blockchain.blocks:
+                print("chain_data/ 已有區塊，請先移除再匯入")
+                sys.exit(1)
+            blockchain.import_from_files(directory)
+    else:
+        blockchain.export_to_files(directory)
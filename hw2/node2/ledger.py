@@ -0,0 +1,111 @@
+from checkpoint_log import CheckpointLog
+
+
+# 解析一筆交易 "sender, receiver, amount"；格式不對回傳 None
+def parse_transaction(tx):
+    parts = tx.split(', ')
+    if len(parts) != 3:
+        return None
+    try:
+        return parts[0], parts[1], int(parts[2])
+    except ValueError:
+        return None
+
+
+# 單一區塊對各帳戶餘額的影響（angel 是發獎勵的帳戶，不扣款）
+def block_deltas(transactions):
+    deltas = {}
+    for tx in transactions:
+        parsed = parse_transaction(tx)
+        if parsed is None:
+            continue
+        s, r, a = parsed
+        if s != "angel":
+            deltas[s] = deltas.get(s, 0) - a
+        deltas[r] = deltas.get(r, 0) + a
+    return deltas
+
+
+# 餘額帳本：記住每個區塊的 delta 與目前餘額，查詢與透支檢查 O(1)
+# 封存的區塊把 delta 附加到 ledger.log 當 checkpoint，重啟時 hash 相符的區塊不必重新解析交易
+class BalanceLedger:
+    def __init__(self, path="chain_data/ledger.log"):
+        self.path = path
+        self.log = CheckpointLog(path)
+        self.balances = {}
+        self.deltas = []  # 第 i 個元素是第 i+1 個區塊的 delta
+
+    def balance(self, user):
+        return self.balances.get(user, 0)
+
+    def _add(self, deltas, sign):
+        for user, amount in deltas.items():
+            self.balances[user] = self.balances.get(user, 0) + sign * amount
+
+    # 最後一個區塊新增一筆交易
+    def apply(self, number, tx):
+        while len(self.deltas) < number:
+            self.deltas.append({})
+        deltas = block_deltas([tx])
+        self._add(deltas, 1)
+        block = self.deltas[number - 1]
+        for user, amount in deltas.items():
+            block[user] = block.get(user, 0) + amount
+
+    # 區塊被同步覆蓋：扣掉舊的 delta 再加上新的
+    def replace(self, number, transactions):
+        while len(self.deltas) < number:
+            self.deltas.append({})
+        self._add(self.deltas[number - 1], -1)
+        self.deltas[number - 1] = block_deltas(transactions)
+        self._add(self.deltas[number - 1], 1)
+
+    # 區塊封存（或封存後被覆蓋）時寫入 checkpoint；同一區塊以最後一筆為準
+    def checkpoint(self, number, block_hash):
+        self.log.append({"block": number, "hash": block_hash, "deltas": self.deltas[number - 1]})
+
+    # 由載入的區塊建立帳本：hash 與 checkpoint 相符就直接用存好的 delta，其餘重新解析
+    def load(self, blocks):
+        saved = self.log.read()
+        self.balances = {}
+        self.deltas = []
+        rebuilt = []
+        for number, block in enumerate(blocks, start=1):
+            record = saved.get(number)
+            if record is not None and record["hash"] == block.hash:
+                deltas = record["deltas"]
+            else:
+                deltas = block_deltas(block.transactions)
+                if block.stored:
+                    rebuilt.append((number, block.hash))
+            self.deltas.append(deltas)
+            self._add(deltas, 1)
+        # 補寫缺少的 checkpoint（例如從 N.txt 匯入之後）
+        for number, block_hash in rebuilt:
+            self.checkpoint(number, block_hash)
+
+    # 全部重新解析交易，並以結果重寫 ledger.log（封存的區塊各一筆），
+    # 有誤但 hash 相符的 checkpoint 不會在下次重啟時又被採用
+    def rebuild(self, blocks):
+        self.balances = {}
+        self.deltas = []
+        records = []
+        for number, block in enumerate(blocks, start=1):
+            deltas = block_deltas(block.transactions)
+            self.deltas.append(deltas)
+            self._add(deltas, 1)
+            if block.stored:
+                records.append({"block": number, "hash": block.hash, "deltas": deltas})
+        self.log.rewrite(records)
+
+    # 重新掃描全部交易，列出與帳本不一致的帳戶：{user: (帳本, 重算)}
+    def verify(self, blocks):
+        replayed = {}
+        for block in blocks:
+            for user, amount in block_deltas(block.transactions).items():
+                replayed[user] = replayed.get(user, 0) + amount
+        mismatches = {}
+        for user in set(replayed) | set(self.balances):
+            if replayed.get(user, 0) != self.balances.get(user, 0):
+                mismatches[user] = (self.balances.get(user, 0), replayed.get(user, 0))
+        return mismatches